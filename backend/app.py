@@ -1,47 +1,75 @@
 from fastapi import FastAPI, HTTPException, Query, Request, Form, Depends
-from fastapi.responses import RedirectResponse, StreamingResponse, HTMLResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import RedirectResponse, StreamingResponse, HTMLResponse, FileResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import os
 import io
+import sys
 import hashlib
+import hmac
+import re
+import secrets
+import threading
 from datetime import datetime
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine, Base
+from database import SessionLocal, init_db, check_connection
 from models import User, Notice
 
-# Helper modules
+# Helper modules (ReportLab, and NumPy via the precedent/dedup indexes, are
+# imported lazily by the routes that use them)
+import legal_ai
 from legal_ai import generate_legal_draft
-from pdf_generator import generate_pdf
 from prompt_builder import build_legal_prompt
+from notice_exporter import EXPORT_FORMATS, export_filename, parse_since, stream_notices
+from page_cache import PageCache, FingerprintedStaticFiles
+from generation_scheduler import AdmissionRejected, generation_scheduler, get_usage, user_tier
 
 # ==============================
 # Load Environment & DB Setup
 # ==============================
 load_dotenv()
-app = FastAPI()
 
-# Create tables if they don't exist
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pre-render the anonymous variant of every page
+    pages.prerender(PAGE_TEMPLATES, anonymous_context())
+
+    # DB, schema, LLM client and PDF engine otherwise initialize on first use
+    if os.getenv("WARMUP_ON_STARTUP", "0") == "1":
+        from warmup import warm_up
+        threading.Thread(target=warm_up, name="warmup", daemon=True).start()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 # ==============================
 # Static & Templates Setup
 # ==============================
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-app.mount(
-    "/static",
-    StaticFiles(directory=os.path.join(BASE_DIR, "static")),
-    name="static"
-)
+static_files = FingerprintedStaticFiles(directory=os.path.join(BASE_DIR, "static"))
+app.mount("/static", static_files, name="static")
 
 templates = Jinja2Templates(
     directory=os.path.join(BASE_DIR, "templates")
 )
+# {{ static_url('file') }} yields a content-hashed /static URL. No template uses it yet:
+# current pages load their CSS/JS/fonts from CDNs and static/ only holds empty files
+templates.env.globals["static_url"] = static_files.url
+
+# Rendered once per (template, referenced context) and served precompressed
+pages = PageCache(templates.env)
+
+PAGE_TEMPLATES = [
+    "index.html", "features.html", "drafting.html", "pricing.html", "about.html",
+    "dashboard.html", "create.html", "templates.html", "drafts.html", "case_studies.html",
+    "document_templates.html", "api_docs.html", "privacy_policy.html", "login.html", "signup.html"
+]
 
 # ==============================
 # CORS
@@ -58,6 +86,8 @@ app.add_middleware(
 # Database Dependency
 # ==============================
 def get_db():
+    # Connects and creates tables on the first request, not at import
+    init_db()
     db = SessionLocal()
     try:
         yield db
@@ -74,6 +104,12 @@ TEMPLATES = {
     "cheque-bounce": "CHEQUE BOUNCE NOTICE..."
 }
 
+# Number of similar earlier notices injected when use_precedents is set
+PRECEDENT_PROMPT_COUNT = 3
+
+# Upper bound on notices merged into one batch PDF
+MAX_BATCH_PDF_NOTICES = 50
+
 # ==============================
 # Pydantic Models
 # ==============================
@@ -89,17 +125,29 @@ class NoticeRequest(BaseModel):
     issue: str
     template: str = ""
     custom_instructions: str = ""
+    use_precedents: bool = False
+    allow_duplicate: bool = False
 
 class PDFRequest(BaseModel):
     notice_id: int = None
     draft_text: str = ""
 
+class BatchPDFRequest(BaseModel):
+    notice_ids: list[int] = Field(..., min_length=1, max_length=MAX_BATCH_PDF_NOTICES)
+
 class UpdateNoticeRequest(BaseModel):
     draft_text: str
 
 # ==============================
 # Authentication Helpers
 # ==============================
+DEFAULT_USER_NAME = "Julian Thorne, Esq."
+
+# Identifies an anonymous browser for generation quotas and fair queueing
+ANON_COOKIE = "anon_id"
+ANON_COOKIE_MAX_AGE = 365 * 24 * 3600
+_ANON_ID_RE = re.compile(r"[0-9a-f]{32}")
+
 def get_current_user_id(request: Request) -> int:
     # Read simple cookie-based session
     user_id_str = request.cookies.get("session_user_id")
@@ -108,93 +156,101 @@ def get_current_user_id(request: Request) -> int:
     return None
 
 def get_current_user_name(request: Request) -> str:
-    return request.cookies.get("session_user_name", "Julian Thorne, Esq.")
+    return request.cookies.get("session_user_name", DEFAULT_USER_NAME)
+
+def require_export_token(request: Request):
+    # Bulk export exposes every client's contact details, so it is off unless a token is configured
+    expected = os.getenv("EXPORT_API_TOKEN", "")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Export API is disabled; set EXPORT_API_TOKEN or use notice_exporter.py")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Invalid export token", headers={"WWW-Authenticate": "Bearer"})
+
+def get_anonymous_id(request: Request) -> str:
+    anon_id = request.cookies.get(ANON_COOKIE, "")
+    return anon_id if _ANON_ID_RE.fullmatch(anon_id) else None
+
+def get_generation_user_key(request: Request) -> str:
+    # Anonymous browsers are budgeted per anon_id cookie (set on page views); clients
+    # without one fall back to their address, which is only the real client address
+    # when the proxy in front is trusted via FORWARDED_ALLOW_IPS
+    user_id = get_current_user_id(request)
+    if user_id is not None:
+        return f"user:{user_id}"
+    anon_id = get_anonymous_id(request)
+    if anon_id:
+        return f"anon:{anon_id}"
+    return f"anon-ip:{request.client.host if request.client else 'unknown'}"
+
+def anonymous_context() -> dict:
+    return {"user_name": DEFAULT_USER_NAME, "user_id": None}
+
+def render_page(request: Request, name: str):
+    user_id = get_current_user_id(request)
+    response = pages.response(request, name, {
+        "user_name": get_current_user_name(request),
+        "user_id": user_id
+    })
+    if user_id is None and not get_anonymous_id(request):
+        response.set_cookie(key=ANON_COOKIE, value=secrets.token_hex(16), path="/",
+                            max_age=ANON_COOKIE_MAX_AGE, httponly=True, samesite="lax")
+    return response
 
 # ==============================
 # Frontend Routes
 # ==============================
 @app.get("/")
 async def index(request: Request):
-    return templates.TemplateResponse("index.html", {
-        "request": request,
-        "user_name": get_current_user_name(request),
-        "user_id": get_current_user_id(request)
-    })
+    return render_page(request, "index.html")
 
 @app.get("/features", response_class=HTMLResponse)
 async def features(request: Request):
-    return templates.TemplateResponse("features.html", {"request": request, "user_name": get_current_user_name(request)})
+    return render_page(request, "features.html")
 
 @app.get("/drafting", response_class=HTMLResponse)
 async def drafting(request: Request):
-    return templates.TemplateResponse("drafting.html", {"request": request, "user_name": get_current_user_name(request)})
+    return render_page(request, "drafting.html")
 
 @app.get("/pricing", response_class=HTMLResponse)
 async def pricing(request: Request):
-    return templates.TemplateResponse("pricing.html", {"request": request, "user_name": get_current_user_name(request)})
+    return render_page(request, "pricing.html")
 
 @app.get("/about", response_class=HTMLResponse)
 async def about(request: Request):
-    return templates.TemplateResponse("about.html", {"request": request, "user_name": get_current_user_name(request)})
+    return render_page(request, "about.html")
 
 @app.get("/dashboard", response_class=HTMLResponse)
 async def dashboard(request: Request):
-    # If not logged in, we let them view but they'll see demo data or we can prompt login
-    # For a seamless experience, we won't strictly block, but we can display their name
-    user_name = get_current_user_name(request)
-    return templates.TemplateResponse("dashboard.html", {
-        "request": request,
-        "user_name": user_name
-    })
+    return render_page(request, "dashboard.html")
 
 @app.get("/create", response_class=HTMLResponse)
 async def create(request: Request):
-    return templates.TemplateResponse("create.html", {
-        "request": request,
-        "user_name": get_current_user_name(request)
-    })
+    return render_page(request, "create.html")
 
 @app.get("/templates", response_class=HTMLResponse)
 async def templates_page(request: Request):
-    return templates.TemplateResponse("templates.html", {
-        "request": request,
-        "user_name": get_current_user_name(request)
-    })
+    return render_page(request, "templates.html")
 
 @app.get("/drafts", response_class=HTMLResponse)
 async def drafts(request: Request):
-    return templates.TemplateResponse("drafts.html", {
-        "request": request,
-        "user_name": get_current_user_name(request)
-    })
+    return render_page(request, "drafts.html")
 
 @app.get("/case-studies", response_class=HTMLResponse)
 async def case_studies(request: Request):
-    return templates.TemplateResponse("case_studies.html", {
-        "request": request,
-        "user_name": get_current_user_name(request)
-    })
+    return render_page(request, "case_studies.html")
 
 @app.get("/document-templates", response_class=HTMLResponse)
 async def document_templates(request: Request):
-    return templates.TemplateResponse("document_templates.html", {
-        "request": request,
-        "user_name": get_current_user_name(request)
-    })
+    return render_page(request, "document_templates.html")
 
 @app.get("/api-docs", response_class=HTMLResponse)
 async def api_docs_page(request: Request):
-    return templates.TemplateResponse("api_docs.html", {
-        "request": request,
-        "user_name": get_current_user_name(request)
-    })
+    return render_page(request, "api_docs.html")
 
 @app.get("/privacy-policy", response_class=HTMLResponse)
 async def privacy_policy(request: Request):
-    return templates.TemplateResponse("privacy_policy.html", {
-        "request": request,
-        "user_name": get_current_user_name(request)
-    })
+    return render_page(request, "privacy_policy.html")
 
 # Redirects for old routes to prevent 404s
 @app.get("/landing")
@@ -214,7 +270,7 @@ async def code5_redirect():
 # ==============================
 @app.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
-    return templates.TemplateResponse("login.html", {"request": request})
+    return render_page(request, "login.html")
 
 @app.post("/login")
 async def login(
@@ -238,7 +294,7 @@ async def login(
 
 @app.get("/signup", response_class=HTMLResponse)
 async def signup_page(request: Request):
-    return templates.TemplateResponse("signup.html", {"request": request})
+    return render_page(request, "signup.html")
 
 @app.post("/signup")
 async def signup(
@@ -282,7 +338,20 @@ async def api_generate_legal_notice(
     req_obj: Request,
     db: Session = Depends(get_db)
 ):
+    from precedent_index import find_precedents, index_notice
+    from dedup_index import find_duplicates, record_sketch
     try:
+        # Skip a new generation when this looks like a resubmission of one of the user's drafts
+        user_id = get_current_user_id(req_obj)
+        duplicate_ids = await run_in_threadpool(
+            find_duplicates, db, request.issue, request.party1_name, request.party2_name, user_id
+        )
+        if duplicate_ids and not request.allow_duplicate:
+            return {
+                "status": "duplicate_found",
+                "duplicate_ids": duplicate_ids
+            }
+
         # Build prompt using the prompt_builder
         issue_text = request.issue
         if request.custom_instructions:
@@ -295,14 +364,22 @@ async def api_generate_legal_notice(
             "party2_address": request.party2_address,
             "issue": issue_text
         }
+
+        # Optionally ground the draft in the most similar earlier notices
+        if request.use_precedents:
+            prompt_data["precedents"] = await run_in_threadpool(find_precedents, db, request.issue, k=PRECEDENT_PROMPT_COUNT)
         
         prompt = build_legal_prompt(prompt_data)
         
-        # Generate legal notice using AI
-        draft_text = generate_legal_draft(prompt)
+        # Generate legal notice using AI (quota-checked, fair-share queued, off the event loop)
+        draft_text = await generation_scheduler.submit(
+            user_key=get_generation_user_key(req_obj),
+            tier=user_tier(user_id),
+            prompt=prompt,
+            fn=lambda: generate_legal_draft(prompt)
+        )
         
         # Save to database
-        user_id = get_current_user_id(req_obj)
         db_notice = Notice(
             party1_name=request.party1_name,
             party1_email=request.party1_email,
@@ -320,13 +397,18 @@ async def api_generate_legal_notice(
         db.add(db_notice)
         db.commit()
         db.refresh(db_notice)
+        index_notice(db_notice)
+        record_sketch(db, db_notice)
         
         return {
             "id": db_notice.id,
             "draft_text": draft_text,
-            "status": "generated_and_saved"
+            "status": "generated_and_saved",
+            "duplicate_ids": duplicate_ids
         }
 
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -346,7 +428,8 @@ async def download_pdf_api(request: PDFRequest, db: Session = Depends(get_db)):
             raise HTTPException(status_code=400, detail="No draft text provided")
 
         # Generate PDF using the custom pdf_generator
-        pdf_path = generate_pdf(text_to_print)
+        from pdf_generator import generate_pdf
+        pdf_path = await run_in_threadpool(generate_pdf, text_to_print)
         
         return FileResponse(
             pdf_path,
@@ -357,10 +440,40 @@ async def download_pdf_api(request: PDFRequest, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/download-pdf/batch")
+async def download_pdf_batch_api(request: BatchPDFRequest, db: Session = Depends(get_db)):
+    try:
+        notices = db.query(Notice).filter(Notice.id.in_(request.notice_ids)).all()
+        by_id = {n.id: n for n in notices}
+        texts = [by_id[i].draft_text for i in request.notice_ids if i in by_id and by_id[i].draft_text]
+
+        if not texts:
+            raise HTTPException(status_code=400, detail="No drafts found for the given notice ids")
+
+        # One document: letterhead/footer/signature forms are shared across notices
+        from pdf_generator import generate_pdf_batch
+        pdf_path = await run_in_threadpool(generate_pdf_batch, texts)
+        
+        return FileResponse(
+            pdf_path,
+            media_type="application/pdf",
+            filename="Legal_Notices.pdf"
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/save-notice")
 async def save_notice_api(request: NoticeRequest, req_obj: Request, db: Session = Depends(get_db)):
+    from precedent_index import index_notice
+    from dedup_index import find_duplicates, record_sketch
     try:
         user_id = get_current_user_id(req_obj)
+        duplicate_ids = await run_in_threadpool(
+            find_duplicates, db, request.issue, request.party1_name, request.party2_name, user_id
+        )
         db_notice = Notice(
             party1_name=request.party1_name,
             party1_email=request.party1_email,
@@ -378,7 +491,9 @@ async def save_notice_api(request: NoticeRequest, req_obj: Request, db: Session
         db.add(db_notice)
         db.commit()
         db.refresh(db_notice)
-        return {"status": "saved", "id": db_notice.id}
+        index_notice(db_notice)
+        record_sketch(db, db_notice)
+        return {"status": "saved", "id": db_notice.id, "duplicate_ids": duplicate_ids}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -400,6 +515,55 @@ async def get_history_api(limit: int = Query(10), db: Session = Depends(get_db))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/export/notices")
+async def export_notices_api(
+    format: str = Query("ndjson"),
+    since: str = Query(None),
+    since_id: int = Query(None),
+    gzip: bool = Query(False),
+    _: None = Depends(require_export_token)
+):
+    # Streams straight from a server-side cursor; never materializes the table
+    try:
+        await run_in_threadpool(init_db)
+        chunks = stream_notices(fmt=format, since=parse_since(since), since_id=since_id, gzip=gzip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {"Content-Disposition": f'attachment; filename="{export_filename(format, gzip)}"'}
+    media_type = "application/gzip" if gzip else EXPORT_FORMATS[format]
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+@app.get("/api/precedents")
+async def precedents_api(
+    q: str = Query(..., min_length=3),
+    k: int = Query(5, ge=1, le=50),
+    exclude_id: int = Query(None),
+    db: Session = Depends(get_db)
+):
+    from precedent_index import find_precedents, precedent_index
+    try:
+        exclude_ids = [exclude_id] if exclude_id else []
+        precedents = await run_in_threadpool(find_precedents, db, q, k=k, exclude_ids=exclude_ids)
+        return {"precedents": precedents, "index": "ready" if precedent_index.built else "building"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _generation_usage(user_key: str) -> dict:
+    # generation_usage may not exist yet in a fresh process
+    init_db()
+    return get_usage(user_key)
+
+@app.get("/api/generation/queue")
+async def generation_queue_api(req_obj: Request):
+    # Queue metrics are per worker; quota figures are shared through the database
+    usage = await run_in_threadpool(_generation_usage, get_generation_user_key(req_obj))
+    return {
+        "queue": generation_scheduler.stats(),
+        "quota": usage,
+        "tier": user_tier(get_current_user_id(req_obj))
+    }
+
 @app.get("/api/notice/{id}")
 async def get_notice_api(id: int, db: Session = Depends(get_db)):
     notice = db.query(Notice).filter(Notice.id == id).first()
@@ -428,15 +592,60 @@ async def update_notice_api(id: int, request: UpdateNoticeRequest, db: Session =
         raise HTTPException(status_code=404, detail="Notice not found")
     notice.draft_text = request.draft_text
     db.commit()
+
+    from precedent_index import index_notice
+    from dedup_index import record_draft
+    index_notice(notice)
+    record_draft(notice)
     return {"status": "updated"}
 
 @app.api_route("/health", methods=["GET", "HEAD"])
+@app.api_route("/health/live", methods=["GET", "HEAD"])
 async def health():
+    # Liveness: the process is up; touches no subsystem
     return {"status": "ok"}
 
+def _index_status(name: str, ready_flag: str, count_key: str) -> dict:
+    # Reads the module's singleton index without importing it (that would pull in NumPy)
+    module = sys.modules.get(name)
+    index = getattr(module, name) if module else None
+    ready = index is not None and getattr(index, ready_flag)
+    return {"status": ready_flag if ready else "lazy", count_key: len(index) if index is not None else 0}
+
+def _readiness_report() -> dict:
+    try:
+        init_db()
+    except Exception:
+        pass  # reported through the database check below
+
+    return {
+        "database": check_connection(),
+        "llm": {
+            "status": "ok" if legal_ai.is_configured() else "missing_api_key",
+            "client": "initialized" if legal_ai.is_initialized() else "lazy"
+        },
+        "pdf_engine": {"status": "loaded" if "pdf_generator" in sys.modules else "lazy"},
+        "precedent_index": _index_status("precedent_index", "built", "notices"),
+        "dedup_index": _index_status("dedup_index", "loaded", "sketches"),
+        "pages": {"status": "ok", "cached_variants": len(pages)},
+        "generation_queue": generation_scheduler.stats()
+    }
+
+@app.api_route("/health/ready", methods=["GET", "HEAD"])
+async def readiness():
+    # Readiness: only the database is required; a missing LLM key leaves page routes usable
+    subsystems = await run_in_threadpool(_readiness_report)
+    database = subsystems["database"]
+    ready = database["status"] == "ok" and database.get("schema_ready", False)
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "subsystems": subsystems}
+    )
+
 # ==============================
 # Local Run
 # ==============================
+# Production runs through launcher.py (gunicorn + uvicorn workers)
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=os.getenv("UVICORN_RELOAD", "0") == "1")
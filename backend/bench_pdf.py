@@ -0,0 +1,144 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import tempfile
+import time
+from datetime import datetime
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+import pdf_generator
+
+WORDS = (
+    "notice client payment demand contract breach section act hereby within days "
+    "failing which legal proceedings shall be initiated against you costs interest "
+    "jurisdiction courts Bhopal"
+).split()
+
+def sample_text(paragraphs: int = 60) -> str:
+    """Synthetic multi-page notice body"""
+    lines = []
+    for i in range(paragraphs):
+        lines.append(f"{i + 1}. " + " ".join(random.choice(WORDS) for _ in range(random.randint(30, 90))))
+        lines.append("")
+    return "\n".join(lines)
+
+def baseline_generate_pdf(text: str) -> str:
+    """
+    The renderer as it was before the form XObject rewrite, kept for comparison
+
+    Draws the letterhead and signature inline, one drawString per line, and
+    re-measures the whole growing line for every word it wraps.
+    """
+    temp_fd, temp_path = tempfile.mkstemp(suffix=".pdf", prefix="legal_baseline_")
+    os.close(temp_fd)
+
+    c = canvas.Canvas(temp_path, pagesize=A4)
+    width, height = A4
+    margin_x = 40
+    margin_y = 40
+    text_width = width - (2 * margin_x)
+    x = margin_x
+    y = height - 50
+
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(x, y, "ADVOCATE & SOLICITOR")
+    y -= 18
+    c.setFont("Helvetica", 10)
+    c.drawString(x, y, "High Court of Madhya Pradesh, Bhopal")
+    y -= 14
+    c.drawString(x, y, "Email: advocate@legal.com | Mobile: +91-XXXXXXXXXX")
+    y -= 28
+    c.setFont("Helvetica-Bold", 14)
+    title = "LEGAL NOTICE"
+    c.drawString((width - c.stringWidth(title, "Helvetica-Bold", 14)) / 2, y, title)
+    y -= 28
+
+    c.setFont("Helvetica", 11)
+    line_height = 14
+    page_num = 1
+    for paragraph in text.split("\n"):
+        if not paragraph.strip():
+            y -= line_height
+            continue
+        for wrapped_line in baseline_wrap_text(paragraph, text_width, c, "Helvetica", 11):
+            if y < margin_y + line_height:
+                c.setFont("Helvetica", 9)
+                c.drawRightString(width - margin_x, margin_y, f"Page {page_num}")
+                c.showPage()
+                page_num += 1
+                y = height - 50
+                c.setFont("Helvetica", 11)
+            c.drawString(x, y, wrapped_line)
+            y -= line_height
+
+    c.setFont("Helvetica", 10)
+    y -= 14
+    c.drawString(x, y, "Place: Bhopal")
+    y -= 14
+    c.drawString(x, y, f"Date: {datetime.now().strftime('%d %B, %Y')}")
+    y -= 28
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(x, y, "Advocate")
+    y -= 14
+    c.setFont("Helvetica", 9)
+    c.drawString(x, y, "Enrollment No: MP/XXXX/XXXX")
+    c.setFont("Helvetica", 9)
+    c.drawRightString(width - margin_x, margin_y, f"Page {page_num}")
+
+    c.save()
+    return temp_path
+
+def baseline_wrap_text(text: str, max_width: float, canvas_obj, font_name: str, font_size: int) -> list:
+    words = text.split()
+    lines = []
+    current_line = ""
+    for word in words:
+        test_line = f"{current_line} {word}".strip()
+        if canvas_obj.stringWidth(test_line, font_name, font_size) <= max_width:
+            current_line = test_line
+        else:
+            if current_line:
+                lines.append(current_line)
+            current_line = word
+    if current_line:
+        lines.append(current_line)
+    return lines
+
+def measure(label: str, render) -> None:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        paths = render()
+    elapsed = time.perf_counter() - start
+
+    pages = size = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        size += len(data)
+        pages += len(re.findall(rb"/Type /Page[^s]", data))
+        os.remove(path)
+    print(f"[BENCH] {label:<24} {pages:>5} pages  {size / pages:>7.0f} bytes/page  {elapsed * 1000 / pages:>6.2f} ms/page")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark PDF rendering (bytes/page and ms/page)")
+    parser.add_argument("--notices", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--mode", choices=["all", "baseline", "current"], default="all",
+                        help="Renderer(s) to measure: the pre-XObject baseline, the current one, or both")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    texts = [sample_text() for _ in range(args.notices)]
+
+    if args.mode in ("all", "baseline"):
+        measure("baseline (per notice)", lambda: [baseline_generate_pdf(t) for t in texts])
+    if args.mode in ("all", "current"):
+        measure("single (cold cache)", lambda: [pdf_generator.generate_pdf(t) for t in texts])
+        measure("single (warm cache)", lambda: [pdf_generator.generate_pdf(t) for t in texts])
+        pdf_generator._wrap_paragraph.cache_clear()
+        measure("batch (cold cache)", lambda: [pdf_generator.generate_pdf_batch(texts)])
@@ -1,40 +1,105 @@
-import os
-from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-
-load_dotenv()
-
-DATABASE_URL = os.getenv("DATABASE_URL")
-
-# Check if PostgreSQL driver is installed
-has_postgres_driver = False
-try:
-    import psycopg2
-    has_postgres_driver = True
-except ImportError:
-    pass
-
-# Robust fallback to SQLite if DATABASE_URL is not set, driver is missing, or connection fails
-if not DATABASE_URL or (DATABASE_URL.startswith("postgresql") and not has_postgres_driver):
-    if DATABASE_URL and DATABASE_URL.startswith("postgresql"):
-        print("⚠️ psycopg2 driver is not installed. Falling back to local SQLite.")
-    DATABASE_URL = "sqlite:///./notices.db"
-
-try:
-    if DATABASE_URL.startswith("postgresql"):
-        # Create engine and verify connection
-        engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-        with engine.connect() as conn:
-            pass
-    else:
-        engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-except Exception as e:
-    print(f"⚠️ Database connection failed ({e}). Falling back to local SQLite.")
-    DATABASE_URL = "sqlite:///./notices.db"
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
-
-Base = declarative_base()
-
\ No newline at end of file
+import os
+import threading
+import importlib.util
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker, declarative_base
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+SQLITE_FALLBACK_URL = "sqlite:///./notices.db"
+
+# Create tables on first use unless schema is managed by `python warmup.py --migrate`
+AUTO_CREATE_SCHEMA = os.getenv("AUTO_CREATE_SCHEMA", "1") == "1"
+
+# Check if PostgreSQL driver is installed (without importing it yet)
+has_postgres_driver = importlib.util.find_spec("psycopg2") is not None
+
+# Fallback to SQLite if DATABASE_URL is not set or driver is missing
+if not DATABASE_URL or (DATABASE_URL.startswith("postgresql") and not has_postgres_driver):
+    if DATABASE_URL and DATABASE_URL.startswith("postgresql"):
+        print("⚠️ psycopg2 driver is not installed. Falling back to local SQLite.")
+    DATABASE_URL = SQLITE_FALLBACK_URL
+
+class LazySessionMaker(sessionmaker):
+    """sessionmaker that connects the engine on the first session, not at import"""
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            get_engine()
+        return super().__call__(**local_kw)
+
+SessionLocal = LazySessionMaker(autoflush=False, autocommit=False)
+
+Base = declarative_base()
+
+engine = None
+schema_ready = False
+_init_lock = threading.Lock()
+# Separate from _init_lock: create_all calls get_engine, which takes that one
+_schema_lock = threading.Lock()
+
+def get_engine():
+    """
+    Create the engine on first use
+
+    A PostgreSQL connection is verified once here (not at import); if it fails
+    we fall back to local SQLite.
+    """
+    global engine, DATABASE_URL
+    if engine is not None:
+        return engine
+
+    with _init_lock:
+        if engine is not None:
+            return engine
+        try:
+            if DATABASE_URL.startswith("postgresql"):
+                # Create engine and verify connection
+                candidate = create_engine(DATABASE_URL, pool_pre_ping=True)
+                with candidate.connect() as conn:
+                    pass
+            else:
+                candidate = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+        except Exception as e:
+            print(f"⚠️ Database connection failed ({e}). Falling back to local SQLite.")
+            DATABASE_URL = SQLITE_FALLBACK_URL
+            candidate = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+
+        SessionLocal.configure(bind=candidate)
+        engine = candidate
+    return engine
+
+def init_db(force: bool = False):
+    """Create tables if they don't exist (once per process)"""
+    global schema_ready
+    if schema_ready and not force:
+        return
+    if not AUTO_CREATE_SCHEMA and not force:
+        return
+
+    import models  # noqa: F401 - registers tables on Base.metadata
+    with _schema_lock:
+        if schema_ready and not force:
+            return
+        bind = get_engine()
+        try:
+            Base.metadata.create_all(bind=bind)
+        except Exception:
+            # Another worker process created the tables between our check and CREATE
+            existing = set(inspect(bind).get_table_names())
+            if not set(Base.metadata.tables) <= existing:
+                raise
+        schema_ready = True
+
+def check_connection() -> dict:
+    """Readiness probe for the database"""
+    try:
+        with get_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
+            # Schema may have been created by the migrate command in another process
+            tables_present = schema_ready or inspect(conn).has_table("notices")
+        return {"status": "ok", "dialect": engine.dialect.name, "schema_ready": tables_present}
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
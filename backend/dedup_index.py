@@ -0,0 +1,323 @@
+import argparse
+import os
+import threading
+import time
+import zlib
+from collections import defaultdict
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import SessionLocal
+from models import Notice, NoticeSketch
+from precedent_index import tokenize
+
+# 64 permutations in 16 bands of 4 rows: pairs above ~0.5 Jaccard collide in
+# at least one band with high probability, the estimate then filters to the threshold
+NUM_PERM = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+DUPLICATE_THRESHOLD = 0.8
+MAX_DUPLICATES = 5
+# Notices saved on other workers are picked up at most this often (seconds);
+# this worker's own saves are indexed immediately
+SYNC_INTERVAL_SECONDS = float(os.getenv("DEDUP_SYNC_SECONDS", "2"))
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Fixed seed: signatures are persisted, so permutations must be stable across processes
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, np.iinfo(np.int64).max, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+_PERM_B = _rng.randint(0, np.iinfo(np.int64).max, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+
+def shingles(issue: Optional[str], party1_name: Optional[str] = None,
+             party2_name: Optional[str] = None) -> set:
+    """Word bigrams of the normalized issue plus tagged party-name tokens"""
+    tokens = tokenize(issue)
+    features = {" ".join(tokens[i:i + 2]) for i in range(len(tokens) - 1)} or set(tokens)
+    features.update(f"p1:{token}" for token in tokenize(party1_name))
+    features.update(f"p2:{token}" for token in tokenize(party2_name))
+    return features
+
+def minhash(features: set) -> np.ndarray:
+    """
+    Compute a MinHash signature
+
+    Returns:
+        uint32 array of NUM_PERM minimum permuted hashes
+    """
+    if not features:
+        return np.full(NUM_PERM, _MAX_HASH, dtype=np.uint32)
+    # crc32 rather than hash(): str hashing is randomized per process
+    hashes = np.fromiter(
+        (zlib.crc32(feature.encode("utf-8")) for feature in features),
+        dtype=np.uint64, count=len(features)
+    )
+    # uint64 products wrap on overflow; this is the usual universal-hash shortcut
+    with np.errstate(over="ignore"):
+        permuted = (np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return (permuted & _MAX_HASH).min(axis=1).astype(np.uint32)
+
+def notice_signature(issue, party1_name=None, party2_name=None) -> np.ndarray:
+    return minhash(shingles(issue, party1_name, party2_name))
+
+class DedupIndex:
+    """
+    In-memory LSH index of MinHash signatures keyed by notice id
+
+    Signatures are persisted in notice_sketches. The index is loaded from that
+    table on first use and periodically syncs notices that other workers
+    inserted since (keyset on the notice id). The owner and whether the notice
+    holds a draft are kept alongside, so queries never touch the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._signatures = {}
+        self._owners = {}
+        self._buckets = [defaultdict(set) for _ in range(LSH_BANDS)]
+        self._synced_id = 0
+        self._synced_at = 0.0
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    @staticmethod
+    def _band_keys(signature: np.ndarray):
+        return [signature[i * LSH_ROWS:(i + 1) * LSH_ROWS].tobytes() for i in range(LSH_BANDS)]
+
+    def add(self, notice_id: int, signature: np.ndarray, user_id: Optional[int] = None,
+            has_draft: bool = False):
+        with self._lock:
+            self.remove(notice_id)
+            self._signatures[notice_id] = signature
+            self._owners[notice_id] = (user_id, has_draft)
+            for band, key in enumerate(self._band_keys(signature)):
+                self._buckets[band][key].add(notice_id)
+
+    def remove(self, notice_id: int):
+        with self._lock:
+            signature = self._signatures.pop(notice_id, None)
+            if signature is None:
+                return
+            del self._owners[notice_id]
+            for band, key in enumerate(self._band_keys(signature)):
+                bucket = self._buckets[band].get(key)
+                if bucket is not None:
+                    bucket.discard(notice_id)
+                    if not bucket:
+                        del self._buckets[band][key]
+
+    def set_has_draft(self, notice_id: int, has_draft: bool):
+        with self._lock:
+            if notice_id in self._owners:
+                self._owners[notice_id] = (self._owners[notice_id][0], has_draft)
+
+    def query(self, signature: np.ndarray, user_id: int, threshold: float = DUPLICATE_THRESHOLD,
+              limit: int = MAX_DUPLICATES) -> List[int]:
+        """Ids of the user's drafted notices with estimated Jaccard similarity >= threshold, best first"""
+        with self._lock:
+            candidates = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                bucket = self._buckets[band].get(key)
+                if bucket:
+                    candidates.update(bucket)
+
+            matches = []
+            for notice_id in candidates:
+                if self._owners[notice_id] != (user_id, True):
+                    continue
+                similarity = float(np.mean(self._signatures[notice_id] == signature))
+                if similarity >= threshold:
+                    matches.append((similarity, notice_id))
+        matches.sort(key=lambda item: (-item[0], item[1]))
+        return [notice_id for _, notice_id in matches[:limit]]
+
+    def sync(self, db, batch_size: int = 1000, persist_missing: bool = False) -> int:
+        """
+        Add notices with an id above the last one synced, using persisted sketches where present
+
+        Rows are read without holding the index lock, so queries keep running;
+        a sync already in progress in another thread makes this call a no-op.
+
+        Args:
+            db: Database session
+            batch_size: Rows per keyset page
+            persist_missing: Store sketches computed for notices that had none
+
+        Returns:
+            Number of sketches computed because none was stored
+        """
+        if not self._sync_lock.acquire(blocking=False):
+            return 0
+        try:
+            query = (
+                db.query(Notice.id, Notice.issue, Notice.party1_name, Notice.party2_name, Notice.user_id,
+                         func.coalesce(func.length(Notice.draft_text), 0) > 0, NoticeSketch.signature)
+                .outerjoin(NoticeSketch, NoticeSketch.notice_id == Notice.id)
+            )
+            computed = 0
+            while True:
+                rows = query.filter(Notice.id > self._synced_id).order_by(Notice.id).limit(batch_size).all()
+                if not rows:
+                    break
+                missing = []
+                entries = []
+                for notice_id, issue, party1_name, party2_name, user_id, has_draft, blob in rows:
+                    if blob is None:
+                        signature = notice_signature(issue, party1_name, party2_name)
+                        missing.append({"notice_id": notice_id, "signature": signature.tobytes()})
+                    else:
+                        signature = np.frombuffer(blob, dtype=np.uint32)
+                    entries.append((notice_id, signature, user_id, bool(has_draft)))
+                with self._lock:
+                    for entry in entries:
+                        self.add(*entry)
+                if missing and persist_missing:
+                    _insert_sketches(db, missing)
+                computed += len(missing)
+                self._synced_id = rows[-1][0]
+            self._synced_at = time.monotonic()
+            return computed
+        finally:
+            self._sync_lock.release()
+
+    def sync_if_stale(self, db):
+        if time.monotonic() - self._synced_at >= SYNC_INTERVAL_SECONDS:
+            self.sync(db)
+
+    def load(self, db, batch_size: int = 1000):
+        """Load persisted sketches, computing (and storing) any that are missing"""
+        with self._lock:
+            self._reset()
+            computed = self.sync(db, batch_size, persist_missing=True)
+            self.loaded = True
+            print(f"[DEDUP] Loaded {len(self._signatures)} notice sketches ({computed} computed)")
+
+def _insert_sketches(db, mappings: List[dict]):
+    """Insert sketches, skipping notice ids another worker stored concurrently"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        db.execute(postgresql.insert(NoticeSketch).on_conflict_do_nothing(index_elements=["notice_id"]), mappings)
+    elif dialect == "sqlite":
+        db.execute(sqlite.insert(NoticeSketch).on_conflict_do_nothing(index_elements=["notice_id"]), mappings)
+    else:
+        for mapping in mappings:
+            db.merge(NoticeSketch(**mapping))
+    db.commit()
+
+def _store_sketches(db, query, batch_size: int) -> int:
+    """
+    Compute and persist sketches for a (id, issue, party1_name, party2_name) query
+
+    Pages through the rows by id (keyset pagination) and commits per batch, so
+    memory stays flat and no cursor is held open across commits.
+    """
+    total = 0
+    last_id = 0
+    while True:
+        rows = query.filter(Notice.id > last_id).order_by(Notice.id).limit(batch_size).all()
+        if not rows:
+            break
+        mappings = []
+        for notice_id, issue, party1_name, party2_name in rows:
+            signature = notice_signature(issue, party1_name, party2_name)
+            mappings.append({"notice_id": notice_id, "signature": signature.tobytes()})
+        _insert_sketches(db, mappings)
+        total += len(rows)
+        last_id = rows[-1][0]
+    return total
+
+# Process-wide index, loaded lazily on first use
+dedup_index = DedupIndex()
+
+_load_lock = threading.Lock()
+_load_thread = None
+
+def ensure_dedup_index(db) -> DedupIndex:
+    """Load the index synchronously if needed (migrations, warm-up and CLI use)"""
+    if not dedup_index.loaded:
+        dedup_index.load(db)
+    return dedup_index
+
+def _load_in_background():
+    db = SessionLocal()
+    try:
+        ensure_dedup_index(db)
+    except Exception as e:
+        print(f"[DEDUP] Index load failed: {e}")
+    finally:
+        db.close()
+
+def start_background_load():
+    """Load the index in a daemon thread so no request waits on it (once per process)"""
+    global _load_thread
+    with _load_lock:
+        if dedup_index.loaded or (_load_thread is not None and _load_thread.is_alive()):
+            return
+        _load_thread = threading.Thread(target=_load_in_background, name="dedup-index", daemon=True)
+        _load_thread.start()
+
+def find_duplicates(db, issue: str, party1_name: str = None, party2_name: str = None,
+                    user_id: Optional[int] = None) -> List[int]:
+    """
+    Ids of the user's existing drafts that look like a resubmission of the same dispute
+
+    Only notices owned by user_id that already hold a draft are returned, so
+    anonymous callers never match. Returns nothing while the index is still
+    loading in the background.
+    """
+    if user_id is None:
+        return []
+    if not dedup_index.loaded:
+        start_background_load()
+        return []
+
+    dedup_index.sync_if_stale(db)
+    return dedup_index.query(notice_signature(issue, party1_name, party2_name), user_id)
+
+def record_sketch(db, notice: Notice):
+    """Persist the sketch of a newly saved notice and add it to the live index"""
+    signature = notice_signature(notice.issue, notice.party1_name, notice.party2_name)
+    _insert_sketches(db, [{"notice_id": notice.id, "signature": signature.tobytes()}])
+    if dedup_index.loaded:
+        dedup_index.add(notice.id, signature, notice.user_id, bool(notice.draft_text))
+
+def record_draft(notice: Notice):
+    """Track whether an edited notice now holds a draft (edits on other workers apply on reload)"""
+    if dedup_index.loaded:
+        dedup_index.set_has_draft(notice.id, bool(notice.draft_text))
+
+def rebuild_sketches(db, batch_size: int = 1000) -> int:
+    """Drop and recompute every persisted sketch in bulk"""
+    db.query(NoticeSketch).delete()
+    db.commit()
+
+    rows = db.query(Notice.id, Notice.issue, Notice.party1_name, Notice.party2_name)
+    total = _store_sketches(db, rows, batch_size)
+
+    # Reloaded from the fresh sketches on next use
+    dedup_index.loaded = False
+    return total
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the near-duplicate notice sketch index")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute all persisted sketches")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.rebuild:
+            print(f"[DEDUP] Rebuilt {rebuild_sketches(db)} sketches")
+        else:
+            print(f"[DEDUP] Index holds {len(ensure_dedup_index(db))} sketches")
+    finally:
+        db.close()
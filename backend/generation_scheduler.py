@@ -0,0 +1,355 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal
+from legal_ai import MAX_TOKENS
+from models import GenerationUsage
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+# Per-user budgets, shared by all workers through the generation_usage table
+QUOTA_WINDOW_SECONDS = env_int("GEN_QUOTA_WINDOW_SECONDS", 3600)
+USER_REQUESTS_PER_WINDOW = env_int("GEN_USER_REQUESTS_PER_WINDOW", 30)
+USER_TOKENS_PER_WINDOW = env_int("GEN_USER_TOKENS_PER_WINDOW", 120000)
+
+# Per-worker admission limits
+MAX_CONCURRENCY = env_int("GEN_MAX_CONCURRENCY", 4)
+MAX_QUEUE = env_int("GEN_MAX_QUEUE", 100)
+MAX_QUEUED_PER_USER = env_int("GEN_MAX_QUEUED_PER_USER", 3)
+MAX_QUEUE_WAIT_SECONDS = env_int("GEN_MAX_QUEUE_WAIT_SECONDS", 120)
+
+# Fair-share weights: a tier with weight 4 gets 4x the throughput of weight 1 under contention
+TIER_WEIGHTS = {"priority": 4, "standard": 2, "free": 1}
+PRIORITY_USER_IDS = {
+    int(user_id) for user_id in os.getenv("GEN_PRIORITY_USER_IDS", "").split(",") if user_id.strip().isdigit()
+}
+
+class AdmissionRejected(Exception):
+    """Raised when a generation is refused; maps to a 429/503 with Retry-After"""
+
+    def __init__(self, detail: str, retry_after: int, status_code: int = 429):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = max(int(math.ceil(retry_after)), 1)
+        self.status_code = status_code
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+def user_tier(user_id: Optional[int]) -> str:
+    if user_id is None:
+        return "free"
+    return "priority" if user_id in PRIORITY_USER_IDS else "standard"
+
+def _window_start(now: float) -> datetime:
+    return datetime.utcfromtimestamp(now - now % QUOTA_WINDOW_SECONDS)
+
+# ==============================
+# Shared quota (database)
+# ==============================
+def reserve_quota(user_key: str, tokens: int) -> datetime:
+    """
+    Atomically charge one request and an estimated token count to the user
+
+    The conditional UPDATE only succeeds while the user stays within budget,
+    so concurrent workers cannot overshoot it.
+
+    Returns:
+        The quota window that was charged
+
+    Raises:
+        AdmissionRejected: User is over their request or token budget
+    """
+    now = time.time()
+    window = _window_start(now)
+    retry_after = QUOTA_WINDOW_SECONDS - now % QUOTA_WINDOW_SECONDS
+
+    if tokens > USER_TOKENS_PER_WINDOW:
+        raise AdmissionRejected("Request exceeds the per-user token budget", retry_after)
+
+    db = SessionLocal()
+    try:
+        for _ in range(2):
+            result = db.execute(
+                update(GenerationUsage)
+                .where(
+                    GenerationUsage.user_key == user_key,
+                    GenerationUsage.window_start == window,
+                    GenerationUsage.requests + 1 <= USER_REQUESTS_PER_WINDOW,
+                    GenerationUsage.tokens + tokens <= USER_TOKENS_PER_WINDOW,
+                )
+                .values(requests=GenerationUsage.requests + 1, tokens=GenerationUsage.tokens + tokens)
+            )
+            if result.rowcount:
+                db.commit()
+                return window
+
+            exists = db.query(GenerationUsage.id).filter(
+                GenerationUsage.user_key == user_key, GenerationUsage.window_start == window
+            ).first()
+            if exists:
+                db.rollback()
+                raise AdmissionRejected("Generation quota exceeded for this user", retry_after)
+
+            # First request in this window; a concurrent insert loses on the unique key and retries
+            try:
+                db.add(GenerationUsage(user_key=user_key, window_start=window, requests=1, tokens=tokens))
+                db.commit()
+                _purge_old_windows(db, window)
+                return window
+            except IntegrityError:
+                db.rollback()
+        raise AdmissionRejected("Generation quota exceeded for this user", retry_after)
+    finally:
+        db.close()
+
+def settle_quota(user_key: str, window: datetime, token_delta: int, refund_request: bool = False):
+    """Correct a reservation once the actual usage is known"""
+    if not token_delta and not refund_request:
+        return
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(GenerationUsage)
+            .where(GenerationUsage.user_key == user_key, GenerationUsage.window_start == window)
+            .values(
+                tokens=GenerationUsage.tokens + token_delta,
+                requests=GenerationUsage.requests - (1 if refund_request else 0),
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def _purge_old_windows(db, current_window: datetime):
+    # Runs once per new user-window, so the table only holds recent usage
+    cutoff = current_window - timedelta(seconds=QUOTA_WINDOW_SECONDS)
+    db.query(GenerationUsage).filter(GenerationUsage.window_start < cutoff).delete()
+    db.commit()
+
+def get_usage(user_key: str) -> dict:
+    """Remaining budget for a user in the current window"""
+    now = time.time()
+    window = _window_start(now)
+    db = SessionLocal()
+    try:
+        row = db.query(GenerationUsage).filter(
+            GenerationUsage.user_key == user_key, GenerationUsage.window_start == window
+        ).first()
+        used_requests = row.requests if row else 0
+        used_tokens = row.tokens if row else 0
+    finally:
+        db.close()
+    return {
+        "window_seconds": QUOTA_WINDOW_SECONDS,
+        "resets_in": int(QUOTA_WINDOW_SECONDS - now % QUOTA_WINDOW_SECONDS),
+        "requests_remaining": max(USER_REQUESTS_PER_WINDOW - used_requests, 0),
+        "tokens_remaining": max(USER_TOKENS_PER_WINDOW - used_tokens, 0),
+    }
+
+def _settle_in_background(*args):
+    # Not awaited: a cancelled request cannot await anything, but the refund must still run
+    asyncio.get_running_loop().run_in_executor(None, settle_quota, *args)
+
+# ==============================
+# Fair queue (per worker)
+# ==============================
+class _Job:
+    __slots__ = ("user_key", "finish", "seq", "future", "enqueued_at")
+
+    def __init__(self, user_key, finish, seq, future):
+        self.user_key = user_key
+        self.finish = finish
+        self.seq = seq
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other):
+        return (self.finish, self.seq) < (other.finish, other.seq)
+
+class GenerationScheduler:
+    """
+    Weighted fair queue in front of the LLM
+
+    Each job gets a virtual finish tag max(V, user's last tag) + cost / weight;
+    free slots go to the smallest tag. A user submitting many drafts therefore
+    only delays their own later jobs, and higher tiers drain proportionally
+    faster. Quotas are enforced through the database before a job is queued,
+    concurrency and ordering are per worker.
+    """
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self._heap = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish = {}
+        self._queued_per_user = {}
+        # Jobs still waiting; the heap may also hold abandoned jobs until they are popped
+        self.queued = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.avg_wait = 0.0
+        self.avg_service = 10.0
+        self.max_wait = 0.0
+
+    def _retry_hint(self, position: int) -> float:
+        return self.avg_service * (position + 1) / self.max_concurrency
+
+    def _dequeue(self, job: _Job):
+        self.queued -= 1
+        self._queued_per_user[job.user_key] -= 1
+        if not self._queued_per_user[job.user_key]:
+            del self._queued_per_user[job.user_key]
+
+    def _abandon(self, job: _Job):
+        """Take a job that timed out or was cancelled out of the live counts"""
+        job.future.cancel()
+        self._dequeue(job)
+        # Drop dead entries once they outnumber live ones, so the heap stays bounded
+        if len(self._heap) > 2 * self.queued + 64:
+            self._heap = [queued_job for queued_job in self._heap if not queued_job.future.done()]
+            heapq.heapify(self._heap)
+
+    def _dispatch(self):
+        while self._heap and self.in_flight < self.max_concurrency:
+            job = heapq.heappop(self._heap)
+            if job.future.done():
+                continue  # abandoned while queued; already uncounted
+            self._dequeue(job)
+            self._virtual_time = max(self._virtual_time, job.finish)
+            self.in_flight += 1
+
+            waited = time.monotonic() - job.enqueued_at
+            self.avg_wait = 0.9 * self.avg_wait + 0.1 * waited
+            self.max_wait = max(self.max_wait, waited)
+            job.future.set_result(waited)
+
+    def _release(self, service_time: float):
+        self.in_flight -= 1
+        self.avg_service = 0.9 * self.avg_service + 0.1 * service_time
+        self._dispatch()
+
+    def _check_queue(self, user_key: str):
+        queued = self._queued_per_user.get(user_key, 0)
+        if queued >= MAX_QUEUED_PER_USER:
+            raise AdmissionRejected("Too many queued generations for this user", self._retry_hint(queued))
+        if self.queued >= MAX_QUEUE:
+            raise AdmissionRejected("Generation queue is full", self._retry_hint(self.queued), status_code=503)
+
+    async def _wait_turn(self, user_key: str, tier: str, cost: float):
+        self._check_queue(user_key)
+        queued = self._queued_per_user.get(user_key, 0)
+
+        start = max(self._virtual_time, self._last_finish.get(user_key, 0.0))
+        finish = start + cost / TIER_WEIGHTS.get(tier, 1)
+        self._last_finish[user_key] = finish
+        # Tags of users who have gone idle no longer matter; keep the map bounded
+        if len(self._last_finish) > 10000:
+            self._last_finish = {k: v for k, v in self._last_finish.items() if v > self._virtual_time}
+
+        future = asyncio.get_running_loop().create_future()
+        job = _Job(user_key, finish, next(self._seq), future)
+        heapq.heappush(self._heap, job)
+        self._queued_per_user[user_key] = queued + 1
+        self.queued += 1
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=MAX_QUEUE_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                return  # slot granted just as the timeout fired
+            self._abandon(job)
+            raise AdmissionRejected("Timed out waiting for a generation slot", self._retry_hint(self.queued), status_code=503)
+        except asyncio.CancelledError:
+            # Client went away; if the slot was already granted, hand it on
+            if future.done() and not future.cancelled():
+                self._release(0.0)
+            elif not future.done():
+                self._abandon(job)
+            raise
+
+    async def submit(self, user_key: str, tier: str, prompt: str, fn: Callable[[], str]) -> str:
+        """
+        Run fn (a blocking LLM call) once the user is within quota and it is their turn
+
+        Raises:
+            AdmissionRejected: Over quota, queue full, or queue wait exceeded
+        """
+        prompt_tokens = estimate_tokens(prompt)
+        reserved = prompt_tokens + MAX_TOKENS
+        # Cheap local checks first so a flooding user is turned away without a DB round trip
+        try:
+            self._check_queue(user_key)
+        except AdmissionRejected:
+            self.rejected += 1
+            raise
+
+        # Shielded: if the caller is cancelled mid-reservation the charge still lands, then gets refunded
+        reservation = asyncio.ensure_future(run_in_threadpool(reserve_quota, user_key, reserved))
+        try:
+            window = await asyncio.shield(reservation)
+        except AdmissionRejected:
+            self.rejected += 1
+            raise
+        except asyncio.CancelledError:
+            def refund(done):
+                if not done.cancelled() and done.exception() is None:
+                    _settle_in_background(user_key, done.result(), -reserved, True)
+            reservation.add_done_callback(refund)
+            raise
+
+        try:
+            await self._wait_turn(user_key, tier, reserved / 1000)
+        except BaseException as e:
+            if isinstance(e, AdmissionRejected):
+                self.rejected += 1
+            # Never ran, so give back both the request and the tokens
+            _settle_in_background(user_key, window, -reserved, True)
+            raise
+
+        self.admitted += 1
+        started = time.monotonic()
+        try:
+            result = await run_in_threadpool(fn)
+        except BaseException:
+            # Failed generations keep the request charge (deters hammering) but not the tokens
+            _settle_in_background(user_key, window, -reserved)
+            raise
+        finally:
+            self._release(time.monotonic() - started)
+
+        actual = prompt_tokens + estimate_tokens(result)
+        await run_in_threadpool(settle_quota, user_key, window, actual - reserved)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queued,
+            "queued_users": len(self._queued_per_user),
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait_seconds": round(self.avg_wait, 3),
+            "max_wait_seconds": round(self.max_wait, 3),
+            "avg_service_seconds": round(self.avg_service, 3),
+        }
+
+# Process-wide scheduler (one per worker)
+generation_scheduler = GenerationScheduler()
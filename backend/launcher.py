@@ -0,0 +1,85 @@
+import multiprocessing
+import os
+
+from gunicorn.app.base import BaseApplication
+
+# uvicorn.workers is deprecated in favour of the standalone uvicorn-worker package
+try:
+    from uvicorn_worker import UvicornWorker
+except ImportError:
+    from uvicorn.workers import UvicornWorker
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+def default_workers() -> int:
+    """(2 x CPU) + 1, capped: each worker holds its own indexes and page cache"""
+    return min(multiprocessing.cpu_count() * 2 + 1, env_int("MAX_WORKERS", 8))
+
+# A generation can take 3 attempts x 90 s plus backoff, so every timeout that
+# can cut a request short is sized above that.
+GRACEFUL_TIMEOUT = env_int("GRACEFUL_TIMEOUT", 300)
+
+class DrainingUvicornWorker(UvicornWorker):
+    """
+    Uvicorn worker that drains in-flight requests on SIGTERM
+
+    On shutdown uvicorn stops accepting connections and waits for running
+    requests (e.g. LLM generations) to finish, up to just under gunicorn's
+    graceful_timeout, before the master would SIGKILL the worker.
+    """
+
+    CONFIG_KWARGS = {
+        "loop": "auto",
+        "http": "auto",
+        "lifespan": "on",
+        "timeout_graceful_shutdown": max(GRACEFUL_TIMEOUT - 5, 1),
+    }
+
+def build_config() -> dict:
+    """Gunicorn settings, each overridable through an environment variable"""
+    return {
+        "bind": os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}"),
+        "chdir": BASE_DIR,
+        "worker_class": "launcher.DrainingUvicornWorker",
+        "workers": env_int("WEB_CONCURRENCY", default_workers()),
+        # Heartbeat timeout; must exceed the longest blocking generation
+        "timeout": env_int("WORKER_TIMEOUT", 300),
+        "graceful_timeout": GRACEFUL_TIMEOUT,
+        # Longer than typical load balancer idle timeouts (60 s) to avoid reset races
+        "keepalive": env_int("KEEPALIVE", 75),
+        # Recycle workers to bound memory growth, staggered so they never restart together
+        "max_requests": env_int("MAX_REQUESTS", 1000),
+        "max_requests_jitter": env_int("MAX_REQUESTS_JITTER", 100),
+        "backlog": env_int("BACKLOG", 2048),
+        # Set to the router's address on a PaaS; otherwise every client appears as the router
+        "forwarded_allow_ips": os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        "loglevel": os.getenv("LOG_LEVEL", "info"),
+        "accesslog": os.getenv("ACCESS_LOG", "-"),
+        "errorlog": "-",
+        # Subsystems initialize lazily per worker, so there is nothing to preload
+        "preload_app": False,
+    }
+
+class LegalAIApplication(BaseApplication):
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key.lower(), value)
+
+    def load(self):
+        from app import app
+        return app
+
+if __name__ == "__main__":
+    config = build_config()
+    print(f"[LAUNCHER] {config['workers']} workers on {config['bind']} "
+          f"(timeout {config['timeout']}s, graceful {config['graceful_timeout']}s)")
+    LegalAIApplication(config).run()
@@ -1,4 +1,3 @@
-import requests
 import os
 from dotenv import load_dotenv
 from typing import Optional
@@ -9,23 +8,44 @@ load_dotenv()
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+# Completion budget per generation (also used by the scheduler for quota estimates)
+MAX_TOKENS = 2000
 
-# ✅ Validate API key at startup
-if not OPENROUTER_API_KEY:
-    raise ValueError("OPENROUTER_API_KEY not found in environment variables")
+# HTTP client, created on first generation so page-only workers never pay for it
+_session = None
 
-HEADERS = {
-    "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-    "Content-Type": "application/json",
-    "HTTP-Referer": "http://localhost:8000",  # ✅ Fixed URL
-    "X-Title": "Legal AI Assistant"
-}
+def is_configured() -> bool:
+    """Whether an API key is available (checked lazily, not at import)"""
+    return bool(OPENROUTER_API_KEY)
+
+def is_initialized() -> bool:
+    return _session is not None
+
+def get_session():
+    """Return the shared HTTP session, creating it on first use"""
+    global _session
+    if _session is None:
+        # ✅ Validate API key on first use instead of crashing at import
+        if not OPENROUTER_API_KEY:
+            raise ValueError("OPENROUTER_API_KEY not found in environment variables")
+
+        import requests
+        session = requests.Session()
+        session.headers.update({
+            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "http://localhost:8000",  # ✅ Fixed URL
+            "X-Title": "Legal AI Assistant"
+        })
+        _session = session
+    return _session
 
 def retry_on_failure(max_retries: int = 3):
     """Decorator for retrying API calls on transient failures"""
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
+            import requests
             for attempt in range(max_retries):
                 try:
                     return func(*args, **kwargs)
@@ -56,6 +76,9 @@ def generate_legal_draft(prompt: str) -> str:
     # ✅ Input validation
     if not prompt or len(prompt.strip()) < 20:
         raise ValueError("Prompt too short or empty")
+
+    import requests
+    session = get_session()
     
     payload = {
         "model": "openai/gpt-4o-mini",  # ✅ Good choice: fast + capable for legal drafting
@@ -76,14 +99,13 @@ Format: Formal Indian legal notice structure
             {"role": "user", "content": prompt}
         ],
         "temperature": 0.1,  # ✅ Lowered for more consistent legal language
-        "max_tokens": 2000,  # ✅ Increased for complete notices
+        "max_tokens": MAX_TOKENS,  # ✅ Increased for complete notices
         "top_p": 0.9
     }
 
     try:
-        response = requests.post(
+        response = session.post(
             OPENROUTER_URL,
-            headers=HEADERS,
             json=payload,
             timeout=90  # ✅ Increased timeout
         )
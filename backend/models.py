@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime, LargeBinary, ForeignKey, UniqueConstraint
 from database import Base
 from datetime import datetime
 
@@ -26,4 +26,20 @@ class Notice(Base):
     template = Column(String, nullable=True)
     draft_text = Column(Text, nullable=True)
     timestamp = Column(DateTime, default=datetime.utcnow)
-    user_id = Column(Integer, nullable=True)
\ No newline at end of file
+    user_id = Column(Integer, nullable=True)
+
+class NoticeSketch(Base):
+    __tablename__ = "notice_sketches"
+
+    notice_id = Column(Integer, ForeignKey("notices.id", ondelete="CASCADE"), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)
+
+class GenerationUsage(Base):
+    __tablename__ = "generation_usage"
+    __table_args__ = (UniqueConstraint("user_key", "window_start", name="uq_generation_usage_window"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_key = Column(String, nullable=False, index=True)
+    window_start = Column(DateTime, nullable=False)
+    requests = Column(Integer, nullable=False, default=0)
+    tokens = Column(Integer, nullable=False, default=0)
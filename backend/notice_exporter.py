@@ -0,0 +1,254 @@
+import argparse
+import csv
+import importlib.util
+import io
+import json
+import sys
+import zlib
+from datetime import datetime
+from typing import Iterator, Optional
+
+from database import SessionLocal
+from models import Notice
+
+# Optional Parquet support (pyarrow is not a hard dependency, and is only
+# imported when a Parquet export actually runs)
+has_pyarrow = importlib.util.find_spec("pyarrow") is not None
+
+# Rows fetched per round trip; the server-side cursor never holds more than this
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FIELDS = [column.name for column in Notice.__table__.columns]
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+def parse_since(value: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO-8601 watermark timestamp (e.g. 2026-01-31T00:00:00)"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid 'since' timestamp: {value!r} (expected ISO-8601)")
+
+def iter_notice_rows(since: Optional[datetime] = None, since_id: Optional[int] = None,
+                     batch_size: int = EXPORT_BATCH_SIZE,
+                     watermark: Optional[dict] = None) -> Iterator[dict]:
+    """
+    Stream notices as plain dicts in id order using a server-side cursor
+
+    Args:
+        since: Only export notices with timestamp strictly after this watermark
+        since_id: Only export notices with id strictly greater than this watermark
+        batch_size: Rows fetched per round trip
+        watermark: Optional dict updated with the last exported "id" and "timestamp"
+
+    Yields:
+        One dict per notice, keyed by EXPORT_FIELDS
+    """
+    # ✅ Own session: a StreamingResponse outlives request-scoped dependencies
+    db = SessionLocal()
+    try:
+        query = db.query(Notice)
+        if since is not None:
+            query = query.filter(Notice.timestamp > since)
+        if since_id is not None:
+            query = query.filter(Notice.id > since_id)
+
+        # ✅ yield_per enables stream_results, so memory stays flat regardless of table size
+        for notice in query.order_by(Notice.id).yield_per(batch_size):
+            row = {field: getattr(notice, field) for field in EXPORT_FIELDS}
+            db.expunge(notice)
+            if watermark is not None:
+                watermark["id"] = row["id"]
+                if row["timestamp"] is not None:
+                    watermark["timestamp"] = max(row["timestamp"], watermark.get("timestamp", row["timestamp"]))
+            yield row
+    finally:
+        db.close()
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Unserializable value: {value!r}")
+
+def _ndjson_chunks(rows: Iterator[dict], batch_size: int) -> Iterator[bytes]:
+    buffer = []
+    for row in rows:
+        buffer.append(json.dumps(row, default=_json_default, ensure_ascii=False))
+        if len(buffer) >= batch_size:
+            yield ("\n".join(buffer) + "\n").encode("utf-8")
+            buffer = []
+    if buffer:
+        yield ("\n".join(buffer) + "\n").encode("utf-8")
+
+def _csv_chunks(rows: Iterator[dict], batch_size: int) -> Iterator[bytes]:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    pending = 0
+    for row in rows:
+        if row.get("timestamp") is not None:
+            row["timestamp"] = row["timestamp"].isoformat()
+        writer.writerow(row)
+        pending += 1
+        if pending >= batch_size:
+            yield out.getvalue().encode("utf-8")
+            out.seek(0)
+            out.truncate(0)
+            pending = 0
+    if out.tell():
+        yield out.getvalue().encode("utf-8")
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only sink whose buffered bytes can be drained between Parquet row groups"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # Parquet footers record absolute offsets, so report the total written
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def _parquet_chunks(rows: Iterator[dict], batch_size: int) -> Iterator[bytes]:
+    if not has_pyarrow:
+        raise ValueError("Parquet export requires pyarrow to be installed")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (field, pa.timestamp("us") if field == "timestamp"
+         else pa.int64() if field in ("id", "user_id") else pa.string())
+        for field in EXPORT_FIELDS
+    ])
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+
+    def flush(batch):
+        writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+        return sink.drain()
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield flush(batch)
+            batch = []
+    if batch:
+        yield flush(batch)
+    writer.close()
+    yield sink.drain()
+
+def _gzip_chunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    # wbits=31 -> gzip container, so the output is a valid .gz stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def stream_notices(fmt: str = "ndjson", since: Optional[datetime] = None,
+                   since_id: Optional[int] = None, gzip: bool = False,
+                   batch_size: int = EXPORT_BATCH_SIZE,
+                   watermark: Optional[dict] = None) -> Iterator[bytes]:
+    """
+    Stream an export of notices as encoded byte chunks
+
+    Args:
+        fmt: One of EXPORT_FORMATS ("ndjson", "csv", "parquet")
+        since: Timestamp watermark for incremental exports
+        since_id: Id watermark for incremental exports
+        gzip: Compress the stream on the fly
+        batch_size: Rows per fetch and per emitted chunk
+        watermark: Optional dict filled with the last exported id/timestamp
+
+    Returns:
+        Iterator of bytes suitable for StreamingResponse or a file
+
+    Raises:
+        ValueError: Unknown format or missing optional dependency
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt!r}")
+    if fmt == "parquet" and not has_pyarrow:
+        raise ValueError("Parquet export requires pyarrow to be installed")
+
+    rows = iter_notice_rows(since=since, since_id=since_id, batch_size=batch_size, watermark=watermark)
+    if fmt == "ndjson":
+        chunks = _ndjson_chunks(rows, batch_size)
+    elif fmt == "csv":
+        chunks = _csv_chunks(rows, batch_size)
+    else:
+        chunks = _parquet_chunks(rows, batch_size)
+
+    return _gzip_chunks(chunks) if gzip else chunks
+
+def export_filename(fmt: str, gzip: bool = False) -> str:
+    """Build a dated download filename such as notices_20260131.ndjson.gz"""
+    name = f"notices_{datetime.utcnow().strftime('%Y%m%d')}.{fmt}"
+    return f"{name}.gz" if gzip else name
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export notices as NDJSON, CSV or Parquet")
+    parser.add_argument("--format", dest="fmt", choices=sorted(EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("--since", help="Only notices with timestamp after this ISO-8601 watermark")
+    parser.add_argument("--since-id", type=int, help="Only notices with id greater than this watermark")
+    parser.add_argument("--gzip", action="store_true", help="Gzip the output on the fly")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    watermark = {}
+    try:
+        chunks = stream_notices(
+            fmt=args.fmt,
+            since=parse_since(args.since),
+            since_id=args.since_id,
+            gzip=args.gzip,
+            batch_size=args.batch_size,
+            watermark=watermark,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    total = 0
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+            total += len(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+    print(f"[EXPORT] Wrote {total} bytes ({args.fmt}{', gzip' if args.gzip else ''})", file=sys.stderr)
+    if watermark:
+        # Feed these back as --since-id / --since on the next incremental run
+        last_ts = watermark.get("timestamp")
+        print(f"[EXPORT] Next watermark: --since-id {watermark['id']}"
+              + (f" --since {last_ts.isoformat()}" if last_ts else ""), file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from jinja2 import Environment, meta
+from fastapi import Request
+from fastapi.responses import Response
+from fastapi.staticfiles import StaticFiles
+
+# Optional Brotli support (falls back to gzip when not installed)
+has_brotli = False
+try:
+    import brotli
+    has_brotli = True
+except ImportError:
+    pass
+
+# Rendered variants kept per process (LRU); anonymous variants are pre-rendered
+PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", "512"))
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 512
+
+STATIC_IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+STATIC_REVALIDATE_CACHE = "public, max-age=0, must-revalidate"
+# Pages can vary with the session cookie, so caches must revalidate with the ETag
+PAGE_CACHE_CONTROL = "private, no-cache"
+
+class RenderedPage:
+    """One rendered template variant with its precompressed encodings"""
+
+    __slots__ = ("body", "etag", "encoded")
+
+    def __init__(self, html: str):
+        self.body = html.encode("utf-8")
+        self.etag = hashlib.sha1(self.body).hexdigest()[:20]
+        # Compressed once at render time, served many times
+        self.encoded = {}
+        if len(self.body) >= MIN_COMPRESS_BYTES:
+            self.encoded["gzip"] = gzip.compress(self.body, compresslevel=9, mtime=0)
+            if has_brotli:
+                self.encoded["br"] = brotli.compress(self.body, quality=11)
+
+    def negotiate(self, accept_encoding: str):
+        """Pick the best available encoding for an Accept-Encoding header"""
+        accepted = {
+            part.split(";")[0].strip().lower()
+            for part in accept_encoding.split(",")
+            if part.strip() and not part.strip().endswith("q=0")
+        }
+        for encoding in ("br", "gzip"):
+            if encoding in self.encoded and encoding in accepted:
+                return encoding, self.encoded[encoding]
+        return None, self.body
+
+class PageCache:
+    """
+    Render-once cache for page templates
+
+    A template is keyed only on the context variables it actually references
+    (found with jinja2.meta), so pages that never show user_name are rendered
+    once for everyone, and personalised pages once per user name.
+    """
+
+    def __init__(self, env: Environment, max_size: int = PAGE_CACHE_SIZE):
+        self.env = env
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._pages = OrderedDict()
+        self._variables = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def _template_variables(self, name: str) -> frozenset:
+        variables = self._variables.get(name)
+        if variables is None:
+            source = self.env.loader.get_source(self.env, name)[0]
+            variables = frozenset(meta.find_undeclared_variables(self.env.parse(source)))
+            self._variables[name] = variables
+        return variables
+
+    def get(self, name: str, context: dict) -> RenderedPage:
+        used = self._template_variables(name)
+        key = (name,) + tuple(sorted((k, v) for k, v in context.items() if k in used))
+
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+                self.hits += 1
+                return page
+
+        page = RenderedPage(self.env.get_template(name).render(context))
+        with self._lock:
+            self.misses += 1
+            self._pages[key] = page
+            while len(self._pages) > self.max_size:
+                self._pages.popitem(last=False)
+        return page
+
+    def prerender(self, names, context: dict) -> int:
+        """Warm the cache with the anonymous variant of each page"""
+        for name in names:
+            self.get(name, context)
+        return len(names)
+
+    def response(self, request: Request, name: str, context: dict) -> Response:
+        """Serve a cached page with ETag revalidation and content negotiation"""
+        page = self.get(name, context)
+        encoding, body = page.negotiate(request.headers.get("accept-encoding", ""))
+        etag = f'"{page.etag}-{encoding}"' if encoding else f'"{page.etag}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": PAGE_CACHE_CONTROL,
+            "Vary": "Accept-Encoding, Cookie",
+        }
+
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="text/html; charset=utf-8", headers=headers)
+
+class FingerprintedStaticFiles(StaticFiles):
+    """
+    StaticFiles with content-hashed URLs
+
+    static_url("style.css") yields /static/style.css?v=<sha256 prefix>; requests
+    carrying a v= fingerprint are cacheable forever, others must revalidate.
+    """
+
+    def __init__(self, *args, url_prefix: str = "/static", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.url_prefix = url_prefix
+        self._fingerprints = {}
+
+    def fingerprint(self, path: str) -> Optional[str]:
+        digest = self._fingerprints.get(path)
+        if digest is None:
+            full_path = os.path.join(self.directory, path)
+            if not os.path.isfile(full_path):
+                return None
+            with open(full_path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:12]
+            self._fingerprints[path] = digest
+        return digest
+
+    def url(self, path: str) -> str:
+        path = path.lstrip("/")
+        digest = self.fingerprint(path)
+        return f"{self.url_prefix}/{path}?v={digest}" if digest else f"{self.url_prefix}/{path}"
+
+    async def get_response(self, path: str, scope) -> Response:
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            query = scope.get("query_string", b"").decode("latin-1")
+            # Only the current fingerprint is immutable; a stale ?v= must revalidate
+            versioned = f"v={self.fingerprint(path.lstrip('/'))}" in query.split("&")
+            response.headers["Cache-Control"] = STATIC_IMMUTABLE_CACHE if versioned else STATIC_REVALIDATE_CACHE
+        return response
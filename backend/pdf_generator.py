@@ -1,19 +1,58 @@
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.lib.units import inch
 import os
 from datetime import datetime
+from functools import lru_cache
 import tempfile
 from fastapi import HTTPException
 
+# ✅ Layout is fixed, so compute it once per process instead of per render
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN_X = 40
+MARGIN_Y = 40
+TEXT_WIDTH = PAGE_WIDTH - (2 * MARGIN_X)
+TOP_Y = PAGE_HEIGHT - 50
+
+BODY_FONT = "Helvetica"
+BODY_SIZE = 11
+LINE_HEIGHT = 14
+
+LETTERHEAD_HEIGHT = 18 + 14 + 28 + 28
+SIGNATURE_HEIGHT = 14 + 14 + 28 + 14
+# Right-hand column reserved for the page number after the "Page" label
+PAGE_NUMBER_WIDTH = stringWidth("000", "Helvetica", 9)
+
+# Reusable form XObject names
+LETTERHEAD_FORM = "letterhead"
+FOOTER_FORM = "footer"
+SIGNATURE_FORM = "signature"
+
 def generate_pdf(text: str, filename: str = "legal_notice.pdf") -> str:
     """
     Generate professional legal notice PDF
-    
+
     Args:
         text: Legal notice content (draft text)
         filename: Output filename
-        
+
+    Returns:
+        Temporary file path
+    """
+    return generate_pdf_batch([text], filename)
+
+def generate_pdf_batch(texts: list, filename: str = "legal_notices.pdf") -> str:
+    """
+    Generate one PDF holding several legal notices, each starting on a new page
+
+    The letterhead, footer and signature block are drawn once as form XObjects
+    and referenced from every notice and page that needs them.
+
+    Args:
+        texts: Legal notice contents (draft texts)
+        filename: Output filename
+
     Returns:
         Temporary file path
     """
@@ -21,106 +60,143 @@ def generate_pdf(text: str, filename: str = "legal_notice.pdf") -> str:
         # ✅ Create temp file
         temp_fd, temp_path = tempfile.mkstemp(suffix=".pdf", prefix="legal_")
         os.close(temp_fd)
-        
-        c = canvas.Canvas(temp_path, pagesize=A4)
-        width, height = A4
-        
-        # Margins
-        margin_x = 40
-        margin_y = 40
-        text_width = width - (2 * margin_x)
-        
-        # Starting position
-        x = margin_x
-        y = height - 50
-        
-        # ✅ Header (Advocate details)
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(x, y, "ADVOCATE & SOLICITOR")
-        y -= 18
-        
-        c.setFont("Helvetica", 10)
-        c.drawString(x, y, "High Court of Madhya Pradesh, Bhopal")
-        y -= 14
-        c.drawString(x, y, "Email: advocate@legal.com | Mobile: +91-XXXXXXXXXX")
-        y -= 28
-        
-        # ✅ Title
-        c.setFont("Helvetica-Bold", 14)
-        title = "LEGAL NOTICE"
-        title_width = c.stringWidth(title, "Helvetica-Bold", 14)
-        c.drawString((width - title_width) / 2, y, title)
-        y -= 28
-        
-        # ✅ Body text with word wrapping
-        c.setFont("Helvetica", 11)
-        line_height = 14
-        page_num = 1
-        
-        for paragraph in text.split("\n"):
-            if not paragraph.strip():
-                y -= line_height
-                continue
-            
-            wrapped_lines = wrap_text(paragraph, text_width, c, "Helvetica", 11)
-            
-            for wrapped_line in wrapped_lines:
-                # Check if new page needed
-                if y < margin_y + line_height:
-                    c.setFont("Helvetica", 9)
-                    c.drawRightString(width - margin_x, margin_y, f"Page {page_num}")
-                    c.showPage()
-                    page_num += 1
-                    y = height - 50
-                    c.setFont("Helvetica", 11)
-                
-                c.drawString(x, y, wrapped_line)
-                y -= line_height
-        
-        # ✅ Footer
-        c.setFont("Helvetica", 10)
-        y -= 14
-        c.drawString(x, y, f"Place: Bhopal")
-        y -= 14
-        c.drawString(x, y, f"Date: {datetime.now().strftime('%d %B, %Y')}")
-        y -= 28
-        
-        c.setFont("Helvetica-Bold", 10)
-        c.drawString(x, y, "Advocate")
-        y -= 14
-        c.setFont("Helvetica", 9)
-        c.drawString(x, y, "Enrollment No: MP/XXXX/XXXX")
-        
-        # Page number on last page
-        c.setFont("Helvetica", 9)
-        c.drawRightString(width - margin_x, margin_y, f"Page {page_num}")
-        
+
+        c = canvas.Canvas(temp_path, pagesize=A4, pageCompression=1)
+        _define_forms(c, datetime.now().strftime('%d %B, %Y'))
+
+        for i, text in enumerate(texts):
+            if i:
+                c.showPage()
+            _draw_notice(c, text)
+
         c.save()
         print(f"[PDF] PDF saved: {temp_path}")
         return temp_path
-    
+
     except Exception as e:
         print(f"[PDF] PDF Error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"PDF generation failed: {str(e)}")
 
-def wrap_text(text: str, max_width: float, canvas_obj, font_name: str, font_size: int) -> list:
-    """Wrap text to fit within max_width"""
-    words = text.split()
+def _define_forms(c, date_str: str):
+    """Record the static blocks once per document; pages reference them via doForm"""
+    # ✅ Header (Advocate details) + title, drawn in page coordinates
+    c.beginForm(LETTERHEAD_FORM)
+    y = TOP_Y
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(MARGIN_X, y, "ADVOCATE & SOLICITOR")
+    y -= 18
+    c.setFont("Helvetica", 10)
+    c.drawString(MARGIN_X, y, "High Court of Madhya Pradesh, Bhopal")
+    y -= 14
+    c.drawString(MARGIN_X, y, "Email: advocate@legal.com | Mobile: +91-XXXXXXXXXX")
+    y -= 28
+    title = "LEGAL NOTICE"
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString((PAGE_WIDTH - stringWidth(title, "Helvetica-Bold", 14)) / 2, y, title)
+    c.endForm()
+
+    # ✅ Footer label; the page number itself is drawn per page
+    c.beginForm(FOOTER_FORM)
+    c.setFont("Helvetica", 9)
+    c.drawRightString(PAGE_WIDTH - MARGIN_X - PAGE_NUMBER_WIDTH, MARGIN_Y, "Page ")
+    c.endForm()
+
+    # ✅ Signature block, drawn relative to its top-left corner. Forms are clipped to
+    # their BBox, so it must cover the block's negative y range (plus descenders)
+    c.beginForm(SIGNATURE_FORM, lowerx=0, lowery=-(SIGNATURE_HEIGHT + LINE_HEIGHT), upperx=TEXT_WIDTH, uppery=0)
+    y = 0
+    c.setFont("Helvetica", 10)
+    y -= 14
+    c.drawString(0, y, "Place: Bhopal")
+    y -= 14
+    c.drawString(0, y, f"Date: {date_str}")
+    y -= 28
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(0, y, "Advocate")
+    y -= 14
+    c.setFont("Helvetica", 9)
+    c.drawString(0, y, "Enrollment No: MP/XXXX/XXXX")
+    c.endForm()
+
+def _draw_footer(c, page_num: int):
+    c.doForm(FOOTER_FORM)
+    c.setFont("Helvetica", 9)
+    c.drawString(PAGE_WIDTH - MARGIN_X - PAGE_NUMBER_WIDTH, MARGIN_Y, str(page_num))
+
+def _draw_notice(c, text: str):
+    c.doForm(LETTERHEAD_FORM)
+    y = TOP_Y - LETTERHEAD_HEIGHT
+    page_num = 1
+
+    # ✅ Body text with word wrapping, emitted as one text object per page
+    body = c.beginText(MARGIN_X, y)
+    body.setFont(BODY_FONT, BODY_SIZE)
+    body.setLeading(LINE_HEIGHT)
+
+    for paragraph in text.split("\n"):
+        if not paragraph.strip():
+            body.textLine("")
+            y -= LINE_HEIGHT
+            continue
+
+        for wrapped_line in _wrap_paragraph(paragraph, TEXT_WIDTH, BODY_FONT, BODY_SIZE):
+            # Check if new page needed
+            if y < MARGIN_Y + LINE_HEIGHT:
+                c.drawText(body)
+                _draw_footer(c, page_num)
+                c.showPage()
+                page_num += 1
+                y = TOP_Y
+                body = c.beginText(MARGIN_X, y)
+                body.setFont(BODY_FONT, BODY_SIZE)
+                body.setLeading(LINE_HEIGHT)
+
+            body.textLine(wrapped_line)
+            y -= LINE_HEIGHT
+
+    c.drawText(body)
+
+    # ✅ Keep the signature block together
+    if y - SIGNATURE_HEIGHT < MARGIN_Y + LINE_HEIGHT:
+        _draw_footer(c, page_num)
+        c.showPage()
+        page_num += 1
+        y = TOP_Y
+
+    c.saveState()
+    c.translate(MARGIN_X, y)
+    c.doForm(SIGNATURE_FORM)
+    c.restoreState()
+
+    # Page number on last page
+    _draw_footer(c, page_num)
+
+@lru_cache(maxsize=4096)
+def _wrap_paragraph(text: str, max_width: float, font_name: str, font_size: int) -> tuple:
+    """Cached word wrap; standard fonts have no kerning, so widths are additive"""
+    space_width = stringWidth(" ", font_name, font_size)
     lines = []
-    current_line = ""
-    
-    for word in words:
-        test_line = f"{current_line} {word}".strip()
-        line_width = canvas_obj.stringWidth(test_line, font_name, font_size)
-        
+    current_words = []
+    current_width = 0.0
+
+    for word in text.split():
+        word_width = stringWidth(word, font_name, font_size)
+        line_width = current_width + space_width + word_width if current_words else word_width
+
         if line_width <= max_width:
-            current_line = test_line
+            current_words.append(word)
+            current_width = line_width
         else:
-            if current_line:
-                lines.append(current_line)
-            current_line = word
-    
-    if current_line:
-        lines.append(current_line)
-    
-    return lines
+            if current_words:
+                lines.append(" ".join(current_words))
+            current_words = [word]
+            current_width = word_width
+
+    if current_words:
+        lines.append(" ".join(current_words))
+
+    return tuple(lines)
+
+def wrap_text(text: str, max_width: float, canvas_obj, font_name: str, font_size: int) -> list:
+    """Wrap text to fit within max_width"""
+    return list(_wrap_paragraph(text, max_width, font_name, font_size))
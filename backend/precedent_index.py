@@ -0,0 +1,351 @@
+import math
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from database import SessionLocal
+from models import Notice
+
+# BM25 parameters (standard Okapi defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# The issue carries the dispute facts, the draft mostly boilerplate
+ISSUE_WEIGHT = 2
+# Only the most frequent draft terms are indexed to keep postings compact
+MAX_DRAFT_TERMS = 64
+# Query terms beyond this (lowest idf first) are dropped to bound latency
+MAX_QUERY_TERMS = 32
+# Terms present in more than this share of notices carry no signal
+MAX_DF_RATIO = 0.5
+# Postings are rewritten without tombstoned slots once this share of slots is dead
+COMPACT_DEAD_RATIO = 0.25
+COMPACT_MIN_SLOTS = 1024
+
+SNIPPET_CHARS = 600
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have he her his i in is it its my of on or our
+she that the their them they this to was we were which will with you your shall said
+""".split())
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase word tokens with stopwords and single characters removed"""
+    if not text:
+        return []
+    return [
+        token for token in _TOKEN_RE.findall(text.lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+class PrecedentIndex:
+    """
+    In-memory BM25 index over Notice.issue and Notice.draft_text
+
+    Postings are stored per term as compact int32 slot / float32 tf arrays and
+    scored with vectorized NumPy, so a top-k query touches only the postings of
+    the query terms. Inserts append in O(terms); an update of an existing notice
+    tombstones its old slot. Document frequencies count live slots only, and the
+    postings are compacted once enough slots are dead.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._postings = {}
+        self._term_ids = {}
+        self._df = array("i")
+        # Term ids of each slot (CSR layout), so removal can decrement their df
+        self._slot_terms = array("i")
+        self._slot_terms_start = np.zeros(1025, dtype=np.int64)
+        self._doc_len = np.zeros(1024, dtype=np.float32)
+        self._notice_ids = np.zeros(1024, dtype=np.int64)
+        self._alive = np.zeros(1024, dtype=bool)
+        self._slot_by_notice = {}
+        self._size = 0
+        self._live_count = 0
+        self._total_len = 0.0
+        self._synced_id = 0
+        self.built = False
+
+    def __len__(self) -> int:
+        return self._live_count
+
+    def _grow(self):
+        capacity = len(self._doc_len) * 2
+        for name in ("_doc_len", "_notice_ids", "_alive", "_slot_terms_start"):
+            old = getattr(self, name)
+            new = np.zeros(capacity + (name == "_slot_terms_start"), dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _remove_slot(self, slot: int):
+        if self._alive[slot]:
+            self._alive[slot] = False
+            self._live_count -= 1
+            self._total_len -= float(self._doc_len[slot])
+            start, end = self._slot_terms_start[slot], self._slot_terms_start[slot + 1]
+            for term_id in self._slot_terms[start:end]:
+                self._df[term_id] -= 1
+
+    def _maybe_compact(self):
+        dead = self._size - self._live_count
+        if self._size >= COMPACT_MIN_SLOTS and dead > COMPACT_DEAD_RATIO * self._size:
+            self._compact()
+
+    def _compact(self):
+        """Drop tombstoned slots from every posting list and renumber the live ones"""
+        size = self._size
+        alive = self._alive[:size]
+        live_slots = np.flatnonzero(alive)
+        remap = np.full(size, -1, dtype=np.int32)
+        remap[live_slots] = np.arange(len(live_slots), dtype=np.int32)
+
+        for term in list(self._postings):
+            if not self._df[self._term_ids[term]]:
+                del self._postings[term]
+                continue
+            slots, tfs = self._postings[term]
+            slot_arr = np.frombuffer(slots, dtype=np.int32)
+            keep = alive[slot_arr]
+            new_slots, new_tfs = array("i"), array("f")
+            new_slots.frombytes(remap[slot_arr[keep]].tobytes())
+            new_tfs.frombytes(np.frombuffer(tfs, dtype=np.float32)[keep].tobytes())
+            self._postings[term] = (new_slots, new_tfs)
+
+        starts = self._slot_terms_start
+        lengths = np.diff(starts[:size + 1])
+        slot_terms = array("i")
+        slot_terms.frombytes(np.frombuffer(self._slot_terms, dtype=np.int32)[np.repeat(alive, lengths)].tobytes())
+        self._slot_terms = slot_terms
+        starts[:] = 0
+        starts[1:len(live_slots) + 1] = np.cumsum(lengths[live_slots])
+
+        live = len(live_slots)
+        for name in ("_doc_len", "_notice_ids"):
+            values = getattr(self, name)
+            values[:live] = values[live_slots]
+        self._alive[:] = False
+        self._alive[:live] = True
+        self._slot_by_notice = {int(notice_id): slot for slot, notice_id in enumerate(self._notice_ids[:live])}
+        self._size = live
+
+    def add(self, notice_id: int, issue: Optional[str], draft_text: Optional[str] = None):
+        """Index (or re-index) a single notice"""
+        terms = Counter()
+        for token in tokenize(issue):
+            terms[token] += ISSUE_WEIGHT
+        for token, count in Counter(tokenize(draft_text)).most_common(MAX_DRAFT_TERMS):
+            terms[token] += count
+
+        with self._lock:
+            old_slot = self._slot_by_notice.get(notice_id)
+            if old_slot is not None:
+                self._remove_slot(old_slot)
+                self._maybe_compact()
+            if not terms:
+                self._slot_by_notice.pop(notice_id, None)
+                return
+
+            if self._size == len(self._doc_len):
+                self._grow()
+            slot = self._size
+            self._size += 1
+
+            doc_len = float(sum(terms.values()))
+            self._doc_len[slot] = doc_len
+            self._notice_ids[slot] = notice_id
+            self._alive[slot] = True
+            self._slot_by_notice[notice_id] = slot
+            self._live_count += 1
+            self._total_len += doc_len
+
+            for term, tf in terms.items():
+                term_id = self._term_ids.get(term)
+                if term_id is None:
+                    term_id = self._term_ids[term] = len(self._df)
+                    self._df.append(0)
+                posting = self._postings.get(term)
+                if posting is None:
+                    posting = self._postings[term] = (array("i"), array("f"))
+                posting[0].append(slot)
+                posting[1].append(tf)
+                self._df[term_id] += 1
+                self._slot_terms.append(term_id)
+            self._slot_terms_start[slot + 1] = len(self._slot_terms)
+
+    def remove(self, notice_id: int):
+        with self._lock:
+            slot = self._slot_by_notice.pop(notice_id, None)
+            if slot is not None:
+                self._remove_slot(slot)
+                self._maybe_compact()
+
+    def search(self, query: str, k: int = 5,
+               exclude_ids: Iterable[int] = ()) -> List[Tuple[int, float]]:
+        """
+        Return up to k (notice_id, score) pairs ranked by BM25 similarity
+
+        Args:
+            query: Free text, typically the issue of the notice being drafted
+            k: Number of results
+            exclude_ids: Notice ids that must not be returned
+
+        Returns:
+            List of (notice_id, score) tuples, best match first
+        """
+        query_terms = set(tokenize(query))
+        with self._lock:
+            if not query_terms or not self._live_count:
+                return []
+
+            n_docs = self._live_count
+            avgdl = self._total_len / n_docs
+            weighted = []
+            for term in query_terms:
+                term_id = self._term_ids.get(term)
+                df = self._df[term_id] if term_id is not None else 0
+                if not df:
+                    continue
+                if df > MAX_DF_RATIO * n_docs and n_docs > 10:
+                    continue
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                weighted.append((idf, self._postings[term]))
+            if not weighted:
+                return []
+            weighted.sort(key=lambda item: item[0], reverse=True)
+
+            size = self._size
+            doc_len = self._doc_len[:size]
+            scores = np.zeros(size, dtype=np.float32)
+            for idf, (slots, tfs) in weighted[:MAX_QUERY_TERMS]:
+                slot_arr = np.frombuffer(slots, dtype=np.int32)
+                tf_arr = np.frombuffer(tfs, dtype=np.float32)
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len[slot_arr] / avgdl)
+                # Each slot appears once per posting list, so fancy-index += is safe
+                scores[slot_arr] += idf * tf_arr * (BM25_K1 + 1) / (tf_arr + norm)
+                del slot_arr, tf_arr
+
+            scores[~self._alive[:size]] = 0
+            for notice_id in exclude_ids:
+                slot = self._slot_by_notice.get(notice_id)
+                if slot is not None:
+                    scores[slot] = 0
+
+            # Select among matched slots only; argpartition over a mostly-zero
+            # vector degrades badly
+            candidates = np.flatnonzero(scores)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+            top = candidates[np.argsort(scores[candidates])[::-1]]
+            return [(int(self._notice_ids[slot]), float(scores[slot])) for slot in top]
+
+    def build(self, db, batch_size: int = 1000):
+        """Bulk (re)build from the notices table, streaming rows with yield_per"""
+        with self._lock:
+            self._reset()
+            rows = db.query(Notice.id, Notice.issue, Notice.draft_text).order_by(Notice.id).yield_per(batch_size)
+            for notice_id, issue, draft_text in rows:
+                self.add(notice_id, issue, draft_text)
+                self._synced_id = notice_id
+            self.built = True
+            print(f"[PRECEDENT] Index built with {self._live_count} notices")
+
+    def refresh(self, db, batch_size: int = 1000) -> int:
+        """
+        Index notices inserted by other workers since the last build/refresh
+
+        A keyset query on the primary key, so it costs one index probe when
+        nothing is new. Edits made on other workers are picked up on rebuild.
+        """
+        rows = (
+            db.query(Notice.id, Notice.issue, Notice.draft_text)
+            .filter(Notice.id > self._synced_id)
+            .order_by(Notice.id)
+            .yield_per(batch_size)
+        )
+        added = 0
+        with self._lock:
+            for notice_id, issue, draft_text in rows:
+                # Notices saved by this worker are already indexed with their latest text
+                if notice_id not in self._slot_by_notice:
+                    self.add(notice_id, issue, draft_text)
+                    added += 1
+                self._synced_id = max(self._synced_id, notice_id)
+        return added
+
+# Process-wide index, built lazily on first use
+precedent_index = PrecedentIndex()
+
+_build_lock = threading.Lock()
+_build_thread = None
+
+def ensure_index(db) -> PrecedentIndex:
+    """Build the index synchronously if needed (warm-up and CLI use)"""
+    if not precedent_index.built:
+        precedent_index.build(db)
+    return precedent_index
+
+def _build_in_background():
+    db = SessionLocal()
+    try:
+        ensure_index(db)
+    except Exception as e:
+        print(f"[PRECEDENT] Index build failed: {e}")
+    finally:
+        db.close()
+
+def start_background_build():
+    """Build the index in a daemon thread so no request waits on it (once per process)"""
+    global _build_thread
+    with _build_lock:
+        if precedent_index.built or (_build_thread is not None and _build_thread.is_alive()):
+            return
+        _build_thread = threading.Thread(target=_build_in_background, name="precedent-index", daemon=True)
+        _build_thread.start()
+
+def index_notice(notice: Notice):
+    """Keep the index current after an insert/update (no-op until first build)"""
+    if precedent_index.built:
+        precedent_index.add(notice.id, notice.issue, notice.draft_text)
+
+def find_precedents(db, query: str, k: int = 5, exclude_ids: Iterable[int] = ()) -> List[dict]:
+    """
+    Top-k similar notices with short snippets, ready for the API or the prompt
+
+    Returns no precedents while the index is still being built in the background.
+    """
+    if not precedent_index.built:
+        start_background_build()
+        return []
+
+    precedent_index.refresh(db)
+    hits = precedent_index.search(query, k=k, exclude_ids=exclude_ids)
+    if not hits:
+        return []
+
+    notices = {
+        n.id: n for n in db.query(Notice).filter(Notice.id.in_([notice_id for notice_id, _ in hits]))
+    }
+    results = []
+    for notice_id, score in hits:
+        notice = notices.get(notice_id)
+        if notice is None:
+            continue
+        results.append({
+            "id": notice.id,
+            "score": round(score, 4),
+            "party1": notice.party1_name,
+            "party2": notice.party2_name,
+            "issue": notice.issue,
+            "snippet": (notice.draft_text or "")[:SNIPPET_CHARS]
+        })
+    return results
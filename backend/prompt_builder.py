@@ -11,6 +11,7 @@ def build_legal_prompt(data: dict) -> str:
     party1 = f"{data['party1_name']}, {data['party1_address']}"
     party2 = f"{data['party2_name']}, {data['party2_address']}"
     issue = data['issue']
+    precedents = build_precedent_section(data.get('precedents'))
     
     return f"""
 === INDIAN LEGAL NOTICE DRAFTING INSTRUCTIONS ===
@@ -38,5 +39,22 @@ def build_legal_prompt(data: dict) -> str:
 - Jurisdiction: Courts at Bhopal, Madhya Pradesh
 - Notice period: 15 days (urgent) OR 30 days (standard)
 
-**Generate COMPLETE notice in proper sequence above.**
+{precedents}**Generate COMPLETE notice in proper sequence above.**
 """
+
+def build_precedent_section(precedents) -> str:
+    """
+    Format similar earlier notices as few-shot reference material
+    """
+    if not precedents:
+        return ""
+    
+    blocks = []
+    for i, p in enumerate(precedents, 1):
+        blocks.append(f"[Precedent {i}] Dispute: {p['issue']}\nExcerpt: {p['snippet']}")
+    
+    return (
+        "**REFERENCE PRECEDENTS (earlier notices - follow structure and tone only, do NOT copy their facts, names or amounts):**\n"
+        + "\n\n".join(blocks)
+        + "\n\n"
+    )
@@ -0,0 +1,26 @@
+import os
+import sys
+import tempfile
+
+# Backend modules import each other as top-level modules (as when run from backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# A throwaway SQLite file; must be set before database.py is first imported
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="legal_tests_"), "test.db")
+
+import pytest
+
+@pytest.fixture
+def db():
+    from database import SessionLocal, init_db
+    from models import Notice, NoticeSketch, GenerationUsage
+    init_db()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        for model in (NoticeSketch, GenerationUsage, Notice):
+            session.query(model).delete()
+        session.commit()
+        session.close()
@@ -0,0 +1,32 @@
+import os
+import threading
+
+import database
+
+def test_concurrent_first_init_creates_schema_once(tmp_path, monkeypatch):
+    original_engine = database.get_engine()
+    monkeypatch.setattr(database, "DATABASE_URL", f"sqlite:///{os.path.join(tmp_path, 'fresh.db')}")
+    monkeypatch.setattr(database, "engine", None)
+    monkeypatch.setattr(database, "schema_ready", False)
+
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def first_request():
+        barrier.wait()
+        try:
+            database.init_db()
+        except Exception as e:
+            errors.append(e)
+
+    try:
+        threads = [threading.Thread(target=first_request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert database.check_connection()["schema_ready"]
+    finally:
+        database.SessionLocal.configure(bind=original_engine)
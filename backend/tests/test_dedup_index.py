@@ -0,0 +1,109 @@
+import threading
+
+import numpy as np
+import pytest
+
+import dedup_index
+from dedup_index import DedupIndex, find_duplicates, notice_signature, rebuild_sketches, record_sketch
+from models import Notice, NoticeSketch
+
+ISSUE = "The tenant has not paid rent for the flat for six months despite repeated reminders"
+
+@pytest.fixture
+def index(db):
+    dedup_index.dedup_index._reset()
+    yield dedup_index.dedup_index
+    dedup_index.dedup_index._reset()
+
+def save_notice(db, issue=ISSUE, user_id=1, draft_text="Draft", party1="Asha Rao", party2="Vikram Shah"):
+    notice = Notice(party1_name=party1, party1_address="Pune", party2_name=party2, party2_address="Mumbai",
+                    issue=issue, draft_text=draft_text, user_id=user_id)
+    db.add(notice)
+    db.commit()
+    return notice
+
+def test_record_sketch_persists_signature(db, index):
+    notice = save_notice(db)
+    record_sketch(db, notice)
+    stored = db.query(NoticeSketch).filter(NoticeSketch.notice_id == notice.id).one()
+    expected = notice_signature(notice.issue, notice.party1_name, notice.party2_name)
+    assert np.array_equal(np.frombuffer(stored.signature, dtype=np.uint32), expected)
+    # Recording again (e.g. a retried save) is a no-op rather than an IntegrityError
+    record_sketch(db, notice)
+
+def test_load_reuses_persisted_sketches_and_backfills_missing(db, index, capsys):
+    stored = save_notice(db)
+    record_sketch(db, stored)
+    save_notice(db, issue="Unpaid salary dues for three months of work")
+
+    fresh = DedupIndex()
+    fresh.load(db)
+    assert len(fresh) == 2
+    assert "(1 computed)" in capsys.readouterr().out
+    assert db.query(NoticeSketch).count() == 2
+
+    DedupIndex().load(db)
+    assert "(0 computed)" in capsys.readouterr().out
+
+def test_rebuild_recomputes_sketches_and_invalidates_index(db, index):
+    notices = [save_notice(db, issue=f"{ISSUE} case {i}") for i in range(3)]
+    db.add(NoticeSketch(notice_id=notices[0].id, signature=b"\0" * 4 * dedup_index.NUM_PERM))
+    db.commit()
+    dedup_index.ensure_dedup_index(db)
+    assert index.loaded
+
+    assert rebuild_sketches(db, batch_size=2) == 3
+    assert not index.loaded
+    stored = db.query(NoticeSketch).filter(NoticeSketch.notice_id == notices[0].id).one()
+    expected = notice_signature(notices[0].issue, notices[0].party1_name, notices[0].party2_name)
+    assert np.array_equal(np.frombuffer(stored.signature, dtype=np.uint32), expected)
+
+def test_find_duplicates_is_scoped_to_the_users_drafts(db, index):
+    own = save_notice(db, user_id=1)
+    other_user = save_notice(db, user_id=2)
+    no_draft = save_notice(db, user_id=1, draft_text=None)
+    for notice in (own, other_user, no_draft):
+        record_sketch(db, notice)
+    dedup_index.ensure_dedup_index(db)
+
+    assert find_duplicates(db, ISSUE, "Asha Rao", "Vikram Shah", user_id=1) == [own.id]
+    assert find_duplicates(db, ISSUE, "Asha Rao", "Vikram Shah", user_id=None) == []
+    assert find_duplicates(db, "Defective washing machine sold without warranty", "Asha Rao",
+                           "Vikram Shah", user_id=1) == []
+
+    no_draft.draft_text = "Now drafted"
+    db.commit()
+    dedup_index.record_draft(no_draft)
+    assert sorted(find_duplicates(db, ISSUE, "Asha Rao", "Vikram Shah", user_id=1)) == sorted([own.id, no_draft.id])
+
+def test_sync_picks_up_notices_saved_elsewhere(db, index, monkeypatch):
+    monkeypatch.setattr(dedup_index, "SYNC_INTERVAL_SECONDS", 0)
+    dedup_index.ensure_dedup_index(db)
+    # Saved by another worker: in the database, never recorded in this process
+    notice = save_notice(db)
+    assert find_duplicates(db, ISSUE, "Asha Rao", "Vikram Shah", user_id=1) == [notice.id]
+
+def test_concurrent_loads_store_each_sketch_once(db, index):
+    for i in range(20):
+        save_notice(db, issue=f"{ISSUE} case {i}")
+
+    barrier = threading.Barrier(4)
+    errors = []
+
+    def load():
+        session = dedup_index.SessionLocal()
+        try:
+            barrier.wait()
+            DedupIndex().load(session, batch_size=5)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=load) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert db.query(NoticeSketch).count() == 20
@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import generation_scheduler as gs
+from generation_scheduler import AdmissionRejected, GenerationScheduler, get_usage, reserve_quota
+
+PROMPT = "Draft a notice for unpaid rent"
+
+def wait_for_requests_remaining(user_key, expected, timeout=5.0):
+    # Refunds of cancelled jobs settle on an executor thread
+    deadline = time.monotonic() + timeout
+    while get_usage(user_key)["requests_remaining"] != expected and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return get_usage(user_key)["requests_remaining"]
+
+async def hold_slot(scheduler, release: threading.Event):
+    """Occupy the scheduler's only slot until release is set"""
+    task = asyncio.ensure_future(scheduler.submit("user:blocker", "standard", PROMPT, lambda: release.wait(5) and "done"))
+    while not scheduler.in_flight:
+        await asyncio.sleep(0.01)
+    return task
+
+async def wait_queued(scheduler, count):
+    while scheduler.queued < count:
+        await asyncio.sleep(0.01)
+
+def run_jobs(scheduler, jobs):
+    """Submit (user_key, tier) jobs behind a busy slot and return the order they ran in"""
+    order = []
+
+    async def scenario():
+        release = threading.Event()
+        blocker = await hold_slot(scheduler, release)
+        tasks = []
+        for name, (user_key, tier) in jobs:
+            tasks.append(asyncio.ensure_future(
+                scheduler.submit(user_key, tier, PROMPT, lambda name=name: order.append(name) or name)
+            ))
+            await wait_queued(scheduler, len(tasks))
+        release.set()
+        await asyncio.gather(blocker, *tasks)
+
+    asyncio.run(scenario())
+    return order
+
+def test_heavy_user_only_delays_their_own_jobs(db):
+    order = run_jobs(GenerationScheduler(max_concurrency=1), [
+        ("a1", ("user:1", "standard")),
+        ("a2", ("user:1", "standard")),
+        ("a3", ("user:1", "standard")),
+        ("b1", ("user:2", "standard")),
+    ])
+    assert order == ["a1", "b1", "a2", "a3"]
+
+def test_higher_tiers_drain_proportionally_faster(db):
+    order = run_jobs(GenerationScheduler(max_concurrency=1), [
+        ("free1", ("anon:f", "free")),
+        ("free2", ("anon:f", "free")),
+        ("prio1", ("user:7", "priority")),
+        ("prio2", ("user:7", "priority")),
+        ("prio3", ("user:7", "priority")),
+    ])
+    # Weight 4 vs 1: all three priority jobs finish (virtually) before the first free one
+    assert order == ["prio1", "prio2", "prio3", "free1", "free2"]
+
+def test_cancelled_queued_job_is_refunded(db):
+    scheduler = GenerationScheduler(max_concurrency=1)
+
+    async def scenario():
+        release = threading.Event()
+        blocker = await hold_slot(scheduler, release)
+        task = asyncio.ensure_future(scheduler.submit("user:3", "standard", PROMPT, lambda: "never"))
+        await wait_queued(scheduler, 1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert scheduler.stats()["queue_depth"] == 0
+        release.set()
+        await blocker
+
+    asyncio.run(scenario())
+    assert wait_for_requests_remaining("user:3", gs.USER_REQUESTS_PER_WINDOW) == gs.USER_REQUESTS_PER_WINDOW
+    assert get_usage("user:3")["tokens_remaining"] == gs.USER_TOKENS_PER_WINDOW
+
+def test_cancellation_during_reservation_is_refunded(db, monkeypatch):
+    reserving = threading.Event()
+
+    def slow_reserve(user_key, tokens):
+        reserving.set()
+        time.sleep(0.2)
+        return reserve_quota(user_key, tokens)
+
+    monkeypatch.setattr(gs, "reserve_quota", slow_reserve)
+    scheduler = GenerationScheduler(max_concurrency=1)
+
+    async def scenario():
+        task = asyncio.ensure_future(scheduler.submit("user:4", "standard", PROMPT, lambda: "never"))
+        while not reserving.is_set():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # Keep the loop alive until the shielded reservation lands and its refund is scheduled
+        await asyncio.sleep(0.5)
+
+    asyncio.run(scenario())
+    assert wait_for_requests_remaining("user:4", gs.USER_REQUESTS_PER_WINDOW) == gs.USER_REQUESTS_PER_WINDOW
+    assert get_usage("user:4")["tokens_remaining"] == gs.USER_TOKENS_PER_WINDOW
+
+def test_queue_timeout_rejects_with_503_and_refunds(db, monkeypatch):
+    monkeypatch.setattr(gs, "MAX_QUEUE_WAIT_SECONDS", 0.1)
+    scheduler = GenerationScheduler(max_concurrency=1)
+
+    async def scenario():
+        release = threading.Event()
+        blocker = await hold_slot(scheduler, release)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await scheduler.submit("user:5", "standard", PROMPT, lambda: "never")
+        assert rejected.value.status_code == 503
+        assert rejected.value.retry_after >= 1
+        assert scheduler.stats()["queue_depth"] == 0
+        release.set()
+        await blocker
+
+    asyncio.run(scenario())
+    assert wait_for_requests_remaining("user:5", gs.USER_REQUESTS_PER_WINDOW) == gs.USER_REQUESTS_PER_WINDOW
+
+def test_reservation_over_budget_is_rejected_with_retry_after(db, monkeypatch):
+    monkeypatch.setattr(gs, "USER_REQUESTS_PER_WINDOW", 2)
+    reserve_quota("user:6", 100)
+    reserve_quota("user:6", 100)
+    with pytest.raises(AdmissionRejected) as rejected:
+        reserve_quota("user:6", 100)
+    assert rejected.value.status_code == 429
+    assert 1 <= rejected.value.retry_after <= gs.QUOTA_WINDOW_SECONDS
+    assert get_usage("user:6")["requests_remaining"] == 0
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        reserve_quota("user:8", gs.USER_TOKENS_PER_WINDOW + 1)
+    assert rejected.value.status_code == 429
+
+def test_generate_endpoint_returns_429_with_retry_after(db, monkeypatch):
+    from fastapi.testclient import TestClient
+    import app as app_module
+
+    monkeypatch.setattr(gs, "USER_REQUESTS_PER_WINDOW", 1)
+    monkeypatch.setattr(app_module, "generate_legal_draft", lambda prompt: "Generated draft")
+    client = TestClient(app_module.app, cookies={"anon_id": "0" * 32})
+    payload = {
+        "party1_name": "Asha Rao", "party1_address": "Pune",
+        "party2_name": "Vikram Shah", "party2_address": "Mumbai",
+        "issue": "The tenant has not paid rent for six months",
+    }
+
+    assert client.post("/generate-legal-notice", json=payload).status_code == 200
+    response = client.post("/generate-legal-notice", json=payload)
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= gs.QUOTA_WINDOW_SECONDS
@@ -0,0 +1,53 @@
+import base64
+import os
+import re
+import zlib
+
+import pdf_generator
+
+FORM_RE = re.compile(rb"<<((?:(?!endobj).)*?/Subtype /Form(?:(?!endobj).)*?)>>\s*stream\r?\n(.*?)endstream", re.S)
+TEXT_RE = re.compile(rb"BT 1 0 0 1 (\S+) (\S+) Tm \((.*?)\) Tj")
+
+def read_forms(path):
+    """(bbox, [(x, y, text)]) for every form XObject in a ReportLab PDF"""
+    with open(path, "rb") as f:
+        data = f.read()
+    os.remove(path)
+    forms = []
+    for header, raw in FORM_RE.findall(data):
+        bbox = [float(v) for v in re.search(rb"/BBox \[([^\]]*)\]", header).group(1).split()]
+        raw = raw.strip()
+        if raw.endswith(b"~>"):
+            raw = raw[:-2]
+        stream = zlib.decompress(base64.a85decode(raw)) if b"ASCII85Decode" in header else raw
+        texts = [(float(x), float(y), text.decode("latin-1")) for x, y, text in TEXT_RE.findall(stream)]
+        forms.append((bbox, texts))
+    return forms
+
+def test_form_text_lies_inside_bbox():
+    forms = read_forms(pdf_generator.generate_pdf("First paragraph\n\nSecond paragraph"))
+    assert len(forms) == 3
+    for (llx, lly, urx, ury), texts in forms:
+        assert texts
+        for x, y, text in texts:
+            # Baselines with room for descenders below them
+            assert llx <= x <= urx and lly <= y - 3 and y <= ury, text
+
+def test_signature_form_is_drawn():
+    forms = read_forms(pdf_generator.generate_pdf("Body"))
+    signature = [texts for _, texts in forms if any(text == "Advocate" for _, _, text in texts)]
+    assert len(signature) == 1
+    assert {text for _, _, text in signature[0]} >= {"Place: Bhopal", "Advocate", "Enrollment No: MP/XXXX/XXXX"}
+
+def test_batch_shares_forms_across_notices():
+    path = pdf_generator.generate_pdf_batch(["One", "Two", "Three"])
+    with open(path, "rb") as f:
+        data = f.read()
+    assert len(read_forms(path)) == 3
+    assert len(re.findall(rb"/Type /Page[^s]", data)) == 3
+
+def test_wrap_respects_width():
+    text = " ".join(["contract"] * 200)
+    lines = pdf_generator.wrap_text(text, 200, None, "Helvetica", 11)
+    assert len(lines) > 1
+    assert all(pdf_generator.stringWidth(line, "Helvetica", 11) <= 200 for line in lines)
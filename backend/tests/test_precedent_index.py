@@ -0,0 +1,103 @@
+import math
+import random
+from collections import Counter
+
+import pytest
+
+import precedent_index
+from precedent_index import PrecedentIndex, tokenize
+
+WORDS = ("cheque bounce rent tenant landlord deposit salary dues breach contract goods "
+         "delivery eviction arrears refund defective warranty loan default cruelty").split()
+
+def doc_terms(issue, draft_text=""):
+    terms = Counter()
+    for token in tokenize(issue):
+        terms[token] += precedent_index.ISSUE_WEIGHT
+    for token, count in Counter(tokenize(draft_text)).most_common(precedent_index.MAX_DRAFT_TERMS):
+        terms[token] += count
+    return terms
+
+def brute_force_scores(docs, query):
+    """Reference BM25 computed from scratch over the live documents"""
+    docs = {notice_id: doc_terms(*text) for notice_id, text in docs.items()}
+    docs = {notice_id: terms for notice_id, terms in docs.items() if terms}
+    n_docs = len(docs)
+    avgdl = sum(sum(terms.values()) for terms in docs.values()) / n_docs
+    scores = Counter()
+    for term in set(tokenize(query)):
+        df = sum(1 for terms in docs.values() if term in terms)
+        if not df or (df > precedent_index.MAX_DF_RATIO * n_docs and n_docs > 10):
+            continue
+        idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        for notice_id, terms in docs.items():
+            tf = terms.get(term)
+            if tf:
+                norm = precedent_index.BM25_K1 * (1 - precedent_index.BM25_B + precedent_index.BM25_B * sum(terms.values()) / avgdl)
+                scores[notice_id] += idf * tf * (precedent_index.BM25_K1 + 1) / (tf + norm)
+    return scores
+
+def assert_matches_brute_force(index, docs, query, k=10):
+    expected = brute_force_scores(docs, query)
+    hits = index.search(query, k=k)
+    assert len(hits) == min(k, len(expected))
+    for notice_id, score in hits:
+        assert score == pytest.approx(expected[notice_id], rel=1e-4)
+    # Nothing better than the k-th hit was left out
+    if hits:
+        assert sorted(expected.values(), reverse=True)[len(hits) - 1] == pytest.approx(hits[-1][1], rel=1e-4)
+
+def random_issue(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 10)))
+
+def test_search_matches_brute_force_bm25():
+    rng = random.Random(1)
+    index = PrecedentIndex()
+    docs = {}
+    for notice_id in range(1, 200):
+        docs[notice_id] = (random_issue(rng), random_issue(rng))
+        index.add(notice_id, *docs[notice_id])
+    for query in ("cheque bounce", "tenant eviction arrears", "defective goods refund warranty"):
+        assert_matches_brute_force(index, docs, query)
+
+def test_updates_removals_and_compaction_match_brute_force(monkeypatch):
+    monkeypatch.setattr(precedent_index, "COMPACT_MIN_SLOTS", 64)
+    rng = random.Random(7)
+    index = PrecedentIndex()
+    docs = {}
+    compactions = 0
+    for _ in range(3000):
+        notice_id = rng.randint(1, 150)
+        size_before = index._size
+        if rng.random() < 0.1:
+            index.remove(notice_id)
+            docs.pop(notice_id, None)
+        else:
+            docs[notice_id] = (random_issue(rng), random_issue(rng))
+            index.add(notice_id, *docs[notice_id])
+        compactions += index._size < size_before
+    assert compactions > 0
+    assert len(index) == len(docs)
+    # Dead slots never exceed the compaction threshold for long
+    assert index._size - len(index) <= precedent_index.COMPACT_DEAD_RATIO * index._size + 1
+
+    for query in ("cheque bounce", "landlord deposit refund", "loan default", "cruelty"):
+        assert_matches_brute_force(index, docs, query)
+
+def test_repeated_edits_do_not_inflate_document_frequency():
+    index = PrecedentIndex()
+    for notice_id in range(1, 21):
+        index.add(notice_id, f"rent default tenant {notice_id} flat arrears", "draft about rent")
+    for _ in range(30):
+        index.add(21, "cheque bounce dishonour payment", "edited draft")
+    assert [notice_id for notice_id, _ in index.search("cheque bounce")] == [21]
+
+def test_exclude_ids_and_empty_queries():
+    index = PrecedentIndex()
+    index.add(1, "cheque bounce", "")
+    index.add(2, "cheque bounce payment", "")
+    assert [notice_id for notice_id, _ in index.search("cheque", exclude_ids=[1])] == [2]
+    assert index.search("the and of") == []
+    index.remove(1)
+    index.remove(2)
+    assert index.search("cheque") == []
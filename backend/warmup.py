@@ -0,0 +1,71 @@
+import argparse
+import sys
+import time
+
+from database import SessionLocal, get_engine, init_db
+
+def run_migrations():
+    """Create missing tables and backfill derived data (safe to re-run)"""
+    started = time.perf_counter()
+    init_db(force=True)
+    print(f"[WARMUP] Schema ready ({(time.perf_counter() - started) * 1000:.0f} ms)")
+
+    # Persist sketches for notices saved before the dedup index existed
+    from dedup_index import ensure_dedup_index
+    db = SessionLocal()
+    try:
+        ensure_dedup_index(db)
+    finally:
+        db.close()
+
+def warm_up():
+    """
+    Initialize every lazy subsystem in this process
+
+    Called from the app lifespan (in a background thread) when
+    WARMUP_ON_STARTUP=1, so requests are served while it runs.
+    """
+    steps = []
+
+    def step(name, fn):
+        started = time.perf_counter()
+        try:
+            fn()
+            steps.append((name, "ok", time.perf_counter() - started))
+        except Exception as e:
+            steps.append((name, f"failed: {e}", time.perf_counter() - started))
+
+    def build_indexes():
+        from precedent_index import ensure_index
+        from dedup_index import ensure_dedup_index
+        db = SessionLocal()
+        try:
+            ensure_index(db)
+            ensure_dedup_index(db)
+        finally:
+            db.close()
+
+    def load_llm_client():
+        import legal_ai
+        if legal_ai.is_configured():
+            legal_ai.get_session()
+
+    step("database", get_engine)
+    step("schema", init_db)
+    step("pdf_engine", lambda: __import__("pdf_generator"))
+    step("llm_client", load_llm_client)
+    step("indexes", build_indexes)
+
+    for name, status, elapsed in steps:
+        print(f"[WARMUP] {name:<11} {status} ({elapsed * 1000:.0f} ms)")
+    return steps
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run schema migrations and warm up lazy subsystems")
+    parser.add_argument("--migrate-only", action="store_true", help="Only create tables and backfill sketches")
+    args = parser.parse_args()
+
+    run_migrations()
+    if not args.migrate_only:
+        failed = [name for name, status, _ in warm_up() if status != "ok"]
+        sys.exit(1 if failed else 0)